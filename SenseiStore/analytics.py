@@ -0,0 +1,136 @@
+import hashlib
+import json
+import threading
+import numpy as np
+import pandas as pd
+
+# Sales dimensions the API can slice by, mapped to their sales columns ("month" is derived from Order_Date)
+DIMENSIONS = {
+    "brand": "Product_Company",
+    "category": "Category",
+    "customer_type": "Customer_Type",
+    "month": "month",
+}
+METRICS = ("revenue", "quantity", "orders")
+CUBE_KEYS = ["Product_Company", "Category", "Customer_Type", "month", "Product"]
+
+
+def order_months(order_dates):
+    # Order_Date is datetime64 from the typed store but dd/mm/YYYY text in rows appended to the CSV
+    if not pd.api.types.is_datetime64_any_dtype(order_dates):
+        order_dates = pd.to_datetime(order_dates, format='%d/%m/%Y', errors='coerce')
+    # Truncate to months in numpy and format each distinct month once, not every row
+    months = pd.Categorical(order_dates.to_numpy().astype('datetime64[M]'))
+    return months.rename_categories(np.datetime_as_string(months.categories.to_numpy(), unit='M'))
+
+
+def metric_values(values):
+    return {"revenue": round(float(values[0]), 2), "quantity": int(values[1]), "orders": int(values[2])}
+
+
+def ranked(totals):
+    # {product: [revenue, quantity, orders]} -> {metric: [(product, revenue, quantity, orders), ...] best first}
+    rows = [(product, float(values[0]), int(values[1]), int(values[2])) for product, values in totals.items()]
+    return {metric: sorted(rows, key=lambda row: -row[i + 1]) for i, metric in enumerate(METRICS)}
+
+
+class SalesAnalytics:
+    # Revenue, quantity and order counts per (brand, category, customer type, month, product) cell.
+    # The cell table is small (products x customer types x months), so new orders are folded into it
+    # and the per-dimension rankings re-derived from it without touching the order history again.
+    # Views are swapped in whole; queries are dict lookups and list slices.
+    def __init__(self, sales_df):
+        self.lock = threading.Lock()
+        self.version = 0
+        self.rebuild(sales_df)
+
+    def rebuild(self, sales_df):
+        with self.lock:
+            self.cells = {}
+            self._add_orders(sales_df)
+            self._derive()
+
+    def update(self, new_sales_df):
+        if new_sales_df.empty:
+            return
+        with self.lock:
+            self._add_orders(new_sales_df)
+            self._derive()
+        print(f"📈 Sales analytics updated with {len(new_sales_df)} new orders")
+
+    def _add_orders(self, sales_df):
+        grouped = (
+            sales_df.assign(month=order_months(sales_df['Order_Date']))
+            .groupby(CUBE_KEYS, sort=False, observed=True)
+            .agg(revenue=('Total_Price', 'sum'), quantity=('Quantity', 'sum'), orders=('Total_Price', 'size'))
+        )
+        values = grouped.to_numpy(dtype=np.float64)
+        for key, row in zip(grouped.index, values):
+            cell = self.cells.get(key)
+            if cell is None:
+                self.cells[key] = row.copy()
+            else:
+                cell += row
+
+    def _derive(self):
+        products = {}
+        groups = {dimension: {} for dimension in DIMENSIONS}
+        positions = {dimension: CUBE_KEYS.index(column) for dimension, column in DIMENSIONS.items()}
+        for key, values in self.cells.items():
+            product = key[-1]
+            products[product] = products.get(product, 0) + values
+            for dimension, position in positions.items():
+                group = groups[dimension].setdefault(str(key[position]), {})
+                group[product] = group.get(product, 0) + values
+
+        self.views = {
+            "overall": ranked(products),
+            "groups": {dimension: {value: ranked(group) for value, group in values.items()} for dimension, values in groups.items()},
+            "summaries": {
+                dimension: [dict(metric_values(sum(group.values())), **{dimension: value}) for value, group in sorted(values.items())]
+                for dimension, values in groups.items()
+            },
+            "totals": metric_values(sum(products.values()) if products else np.zeros(len(METRICS))),
+        }
+        self.version += 1
+
+    def summary(self, dimension):
+        # Totals per value of one dimension, e.g. revenue per brand, in value order
+        return self.views["summaries"][dimension]
+
+    def top_products(self, dimension=None, value=None, metric="revenue", n=10):
+        views = self.views
+        if dimension is None:
+            rows = views["overall"][metric]
+        else:
+            group = views["groups"][dimension].get(value)
+            rows = group[metric] if group is not None else []
+        return [
+            {"Product": product, "revenue": round(revenue, 2), "quantity": quantity, "orders": orders}
+            for product, revenue, quantity, orders in rows[:n]
+        ]
+
+    def totals(self):
+        return self.views["totals"]
+
+
+class CachedResponses:
+    # Serialized JSON and its ETag per query, dropped whenever the analytics version changes
+    def __init__(self, analytics, max_entries=512):
+        self.analytics = analytics
+        self.max_entries = max_entries
+        self.version = None
+        self.entries = {}
+
+    def get(self, key, build):
+        version = self.analytics.version
+        if version != self.version:
+            self.entries = {}
+            self.version = version
+        entry = self.entries.get(key)
+        if entry is None:
+            body = json.dumps(build())
+            entry = (body, hashlib.sha1(body.encode("utf-8")).hexdigest()[:20])
+            if len(self.entries) < self.max_entries:
+                self.entries[key] = entry
+        return entry
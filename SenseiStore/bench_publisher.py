@@ -0,0 +1,167 @@
+import argparse
+import contextlib
+import json
+import os
+import resource
+import threading
+import time
+
+from pub import MultiDetector
+from sources import ScriptedSensor, parse_source
+
+# Runs the MultiDetector pipeline on a recorded video, an image folder or synthetic frames, with no camera,
+# GPIO or broker, and reports per-stage FPS, DeepFace calls/s, CPU, RSS and publish bandwidth.
+# Frames are read as fast as possible unless --fps is given, so the models are the bottleneck.
+
+
+class CountingPublisher:
+    # Stands in for the paho client: counts messages and bytes per topic and keeps the metrics reports
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.topics = {}
+        self.reports = []
+
+    def publish(self, topic, payload):
+        size = len(payload if isinstance(payload, bytes) else payload.encode("utf-8"))
+        with self.lock:
+            counts = self.topics.setdefault(topic, {"messages": 0, "bytes": 0})
+            counts["messages"] += 1
+            counts["bytes"] += size
+            if topic.endswith("/metrics"):
+                self.reports.append(json.loads(payload))
+
+    def loop_stop(self):
+        pass
+
+    def disconnect(self):
+        pass
+
+
+def summarize(publisher, detector, started_at, elapsed, cpu_seconds, warmup):
+    # Stage reports from the warm-up period (model loading, first inference) are left out
+    reports = [r for r in publisher.reports if r["timestamp"] - started_at >= warmup] or publisher.reports
+    measured = max(len(reports) * detector.stats_interval, 1e-6)
+    stages = {}
+    for report in reports:
+        for stage in report["stages"]:
+            totals = stages.setdefault(stage["stage"], {"frames": 0, "busy_ms": 0.0, "skipped": 0})
+            totals["frames"] += stage["frames"]
+            totals["busy_ms"] += (stage["latency_ms"] or 0) * stage["frames"]
+            totals["skipped"] += stage["skipped"]
+
+    return {
+        "elapsed_s": round(elapsed, 1),
+        "measured_s": round(measured, 1),
+        "stages": {
+            name: {
+                "fps": round(t["frames"] / measured, 2),
+                "latency_ms": round(t["busy_ms"] / t["frames"], 1) if t["frames"] else None,
+                "skipped": t["skipped"],
+            }
+            for name, t in stages.items()
+        },
+        "deepface_calls_per_s": round(sum(r["deepface_calls"] for r in reports) / measured, 2),
+        "gates": reports[-1]["gates"] if reports else {},
+        "stream": reports[-1]["stream"] if reports else {},
+        "drinks": reports[-1]["drinks"] if reports else {},
+        "latency": detector.tracer.snapshot(),
+        "cpu_percent": round(cpu_seconds / elapsed * 100, 1),
+        "cpu_count": os.cpu_count(),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "publish": {
+            topic: {
+                "messages_per_s": round(c["messages"] / elapsed, 2),
+                "kb_per_s": round(c["bytes"] / 1024 / elapsed, 1),
+            }
+            for topic, c in publisher.topics.items()
+        },
+    }
+
+
+def cpu_time():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the publisher pipeline without camera, GPIO or broker")
+    parser.add_argument("--source", default="synthetic", help="video:<path>, images:<dir>, synthetic[:WxH] or camera[:index]")
+    parser.add_argument("--size", help="resize source frames to WxH, e.g. 320x240")
+    parser.add_argument("--fps", type=float, default=0, help="pace the source to this FPS, 0 = full speed")
+    parser.add_argument("--duration", type=float, default=60, help="seconds to run")
+    parser.add_argument("--warmup", type=float, default=5, help="seconds left out of the stage figures")
+    parser.add_argument("--trace", help="scripted distance trace 'seconds:cm,...', default: someone always present")
+    parser.add_argument("--threshold", type=float, default=80.0, help="presence distance in cm")
+    parser.add_argument("--runtime", default="pytorch", choices=["pytorch", "onnx", "openvino"])
+    parser.add_argument("--imgsz", type=int, default=256)
+    parser.add_argument("--max-batch", type=int, default=1)
+    parser.add_argument("--max-batch-wait", type=float, default=0.05)
+    parser.add_argument("--no-batch-emotions", action="store_true")
+    parser.add_argument("--no-motion-gating", action="store_true")
+    parser.add_argument("--motion-roi", action="store_true")
+    parser.add_argument("--drink-votes", default="3/5", help="N/M: frames out of the last M a drink must be seen in")
+    parser.add_argument("--drink-heartbeat", type=float, default=2.0, help="seconds between holding events, 0 = none")
+    parser.add_argument("--no-warm-up", action="store_true", help="skip the model warm-up at boot")
+    parser.add_argument("--no-standby", action="store_true", help="close the source whenever nobody is present")
+    parser.add_argument("--report-interval", type=float, default=2.0)
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--verbose", action="store_true", help="show the pipeline's own log output")
+    args = parser.parse_args()
+
+    size = tuple(int(v) for v in args.size.split("x")) if args.size else None
+    drink_votes, drink_window = (int(v) for v in args.drink_votes.split("/"))
+    publisher = CountingPublisher()
+    detector = MultiDetector(
+        inference_runtime=args.runtime,
+        max_batch=args.max_batch,
+        max_batch_wait=args.max_batch_wait,
+        batch_emotions=not args.no_batch_emotions,
+        motion_gating=not args.no_motion_gating,
+        motion_roi=args.motion_roi,
+        imgsz=args.imgsz,
+        frame_source=parse_source(args.source, fps=args.fps, size=size),
+        client=publisher,
+        drink_votes=drink_votes,
+        drink_window=drink_window,
+        drink_heartbeat=args.drink_heartbeat,
+        warm_up=not args.no_warm_up,
+        standby=not args.no_standby,
+    )
+    detector.stats_interval = args.report_interval
+    sensor = ScriptedSensor.parse(args.trace) if args.trace else ScriptedSensor([(0, 0)])
+
+    started_at = time.time()
+    started = time.monotonic()
+    cpu_before = cpu_time()
+    with open(os.devnull, "w") as devnull, contextlib.ExitStack() as stack:
+        if not args.verbose:
+            stack.enter_context(contextlib.redirect_stdout(devnull))
+        runner = threading.Thread(target=detector.run, args=(sensor, args.threshold), daemon=True)
+        runner.start()
+        time.sleep(args.duration)
+        detector.stop_event.set()
+        runner.join(timeout=10)
+    elapsed = time.monotonic() - started
+
+    report = summarize(publisher, detector, started_at, elapsed, cpu_time() - cpu_before, args.warmup)
+    print(f"📊 {args.source} @ imgsz {args.imgsz}, {args.runtime}, batch {args.max_batch}: "
+          f"CPU {report['cpu_percent']}% of 1 core ({report['cpu_count']} cores), max RSS {report['max_rss_mb']} MB")
+    for name, stage in report["stages"].items():
+        print(f"   {name}: {stage['fps']} fps, {stage['latency_ms']} ms/frame, skipped {stage['skipped']}")
+    print(f"   deepface: {report['deepface_calls_per_s']} calls/s")
+    if report["stream"]:
+        stream = report["stream"]
+        print(f"   stream: {stream['width']}px, quality {stream['quality']}, {stream['fps']} fps (level {stream['level']})")
+    if report["drinks"]:
+        drinks = report["drinks"]
+        print(f"   drinks: {drinks['detections']} detections in {drinks['frames']} frames -> "
+              f"{drinks['pickup_started']} pickups, {drinks['holding']} heartbeats, {drinks['released']} put down")
+    for topic, rate in report["publish"].items():
+        print(f"   {topic}: {rate['messages_per_s']} msgs/s, {rate['kb_per_s']} KB/s")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+import argparse
+import base64
+import contextlib
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+import main
+from frame_protocol import pack_frame
+from kiosks import KioskRegistry, kiosk_topic, parse_topic
+from recommender import EMOTION_PROFILES
+from tracing import Histogram, Tracer
+
+# Replays camera/* traffic through main.handle_mqtt_message without a Pi or camera, either by calling the
+# handler in-process or through a local broker, and reports throughput, handler latency, emits and memory.
+# Thresholds turn it into a regression check: the exit code is 1 when any of them is missed.
+# With --kiosks 1,2,4,8 it repeats the run with traffic from that many kiosks, each at --rate, as a scaling test.
+TOPICS = {"detection": "detection", "softdrink": "softdrink", "video": "videostreaming"}
+
+
+class CountingEmitter:
+    # Stands in for SocketIO: counts emits and acknowledges frames straight away, like a fast browser
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {}
+        self.bytes = 0
+
+    def emit(self, event, data, to=None, callback=None):
+        with self.lock:
+            self.counts[event] = self.counts.get(event, 0) + 1
+            if isinstance(data, dict) and isinstance(data.get("frame"), bytes):
+                self.bytes += len(data["frame"])
+        if callback is not None:
+            callback()
+
+
+def parse_mix(text):
+    # "detection=1,softdrink=1,video=8" -> {"detection": 1.0, ...}
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in TOPICS:
+            raise argparse.ArgumentTypeError(f"unknown message kind '{name}', expected one of {', '.join(TOPICS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def synthetic_messages(count, mix, products, frame_kb=30, face_kb=3, seed=0, kiosks=1):
+    rng = random.Random(seed)
+    kinds = list(mix)
+    weights = [mix[kind] for kind in kinds]
+    emotions = list(EMOTION_PROFILES)
+    frame = rng.randbytes(frame_kb * 1024)
+    face_b64 = base64.b64encode(rng.randbytes(face_kb * 1024)).decode("utf-8")
+    for seq in range(1, count + 1):
+        kind = rng.choices(kinds, weights)[0]
+        topic = kiosk_topic(f"kiosk-{seq % kiosks}", TOPICS[kind])
+        now = time.time()
+        if kind == "video":
+            yield topic, pack_frame(frame, seq, 640, 480, timestamp=now)
+            continue
+        payload = {
+            "timestamp": datetime.now().strftime("%Y%m%d_%H%M%S"),
+            "confidence_score": round(rng.uniform(0.8, 1.0), 2),
+            "image_b64": face_b64,
+            "seq": seq,
+            "captured_at": now,
+        }
+        if kind == "detection":
+            payload.update(emotion=rng.choice(emotions), track_id=rng.randint(1, 4))
+        else:
+            product_id, product_name = rng.choice(products)
+            payload.update(product_id=product_id, product_name=product_name)
+        yield topic, json.dumps(payload).encode("utf-8")
+
+
+def load_recording(path):
+    # JSON lines of {"topic": ..., "payload_b64": ...}, as written by --record
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                yield entry["topic"], base64.b64decode(entry["payload_b64"])
+
+
+def mqtt_client(**kwargs):
+    # The server pins paho-mqtt 1.6 (Flask-MQTT); callback_api_version only exists from paho 2.0.
+    # on_message has the same signature under both.
+    import paho.mqtt.client as mqtt
+    if hasattr(mqtt, "CallbackAPIVersion"):
+        kwargs["callback_api_version"] = mqtt.CallbackAPIVersion.VERSION2
+    return mqtt.Client(**kwargs)
+
+
+def record(host, port, path, duration):
+
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        def on_message(client, userdata, message):
+            nonlocal count
+            if parse_topic(message.topic)[1] in TOPICS.values():
+                f.write(json.dumps({"topic": message.topic, "payload_b64": base64.b64encode(message.payload).decode()}) + "\n")
+                count += 1
+
+        client = mqtt_client()
+        client.on_message = on_message
+        client.connect(host, port)
+        client.subscribe("camera/#")
+        client.loop_start()
+        time.sleep(duration)
+        client.loop_stop()
+        client.disconnect()
+    print(f"✅ Recorded {count} messages to {path}")
+
+
+def paced(messages, rate):
+    # Yields messages no faster than rate per second (0 = as fast as possible)
+    started = time.perf_counter()
+    for i, message in enumerate(messages):
+        if rate:
+            delay = started + i / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        yield message
+
+
+class TimedHandler:
+    def __init__(self):
+        self.histogram = Histogram()
+        self.lock = threading.Lock()
+        self.handled = 0
+
+    def __call__(self, client, userdata, message):
+        started = time.perf_counter()
+        main.handle_mqtt_message(client, userdata, message)
+        ms = (time.perf_counter() - started) * 1000
+        with self.lock:
+            self.histogram.observe(ms)
+            self.handled += 1
+
+
+def run_inprocess(messages, rate, handler):
+    sent = 0
+    for topic, payload in paced(messages, rate):
+        handler(None, None, SimpleNamespace(topic=topic, payload=payload))
+        sent += 1
+    return sent
+
+
+def run_broker(messages, rate, handler, host, port, timeout=30):
+
+    if not main.mqtt.connected:
+        main.app.config['MQTT_BROKER_URL'] = host
+        main.app.config['MQTT_BROKER_PORT'] = port
+        main.start_mqtt()
+        time.sleep(1)
+    main.mqtt.client.on_message = handler
+
+    publisher = mqtt_client(client_id="bench-publisher")
+    publisher.connect(host, port)
+    publisher.loop_start()
+    sent = 0
+    for topic, payload in paced(messages, rate):
+        publisher.publish(topic, payload)
+        sent += 1
+    deadline = time.monotonic() + timeout
+    while handler.handled < sent and time.monotonic() < deadline:
+        time.sleep(0.05)
+    publisher.loop_stop()
+    publisher.disconnect()
+    return sent
+
+
+def wait_for_drain(timeout=5):
+    deadline = time.monotonic() + timeout
+    while main.event_bus.metrics()["queue_depth"] and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+
+def check_thresholds(report, args):
+    failures = []
+    latency = report["handler_latency"]
+    if args.max_p50_ms is not None and (latency["p50_ms"] or 0) > args.max_p50_ms:
+        failures.append(f"p50 {latency['p50_ms']} ms > {args.max_p50_ms} ms")
+    if args.max_p99_ms is not None and (latency["p99_ms"] or 0) > args.max_p99_ms:
+        failures.append(f"p99 {latency['p99_ms']} ms > {args.max_p99_ms} ms")
+    if args.min_rate is not None and report["messages_per_s"] < args.min_rate:
+        failures.append(f"{report['messages_per_s']} msgs/s < {args.min_rate} msgs/s")
+    if args.max_rss_mb is not None and report["max_rss_mb"] > args.max_rss_mb:
+        failures.append(f"max RSS {report['max_rss_mb']} MB > {args.max_rss_mb} MB")
+    if report["handled"] < report["sent"]:
+        failures.append(f"only {report['handled']} of {report['sent']} messages handled")
+    return failures
+
+
+def run_once(args, kiosks):
+    # Fresh services, cooldown state and histograms for every run
+    emitter = CountingEmitter()
+    main.tracer = Tracer()
+    main.kiosks = KioskRegistry(*((main.app.config['EMOTION_COOLDOWN_PERIOD'], main.app.config['BRAND_COOLDOWN_PERIOD'])
+                                  if args.cooldowns else (0, 0)))
+    # Benchmark interactions go to a scratch database, not the kiosk history
+    scratch = tempfile.TemporaryDirectory(prefix="bench-interactions-")
+    main.app.config['INTERACTION_DB_PATH'] = os.path.join(scratch.name, "interactions.db")
+    main.init_services(emitter=emitter, tts=False, watch_sales=False)
+    for k in range(kiosks):
+        for i in range(args.clients):
+            main.event_bus.connect(f"bench-{k}-{i}", f"kiosk-{k}")
+
+    if args.replay:
+        messages = list(load_recording(args.replay))
+    else:
+        # A pool of distinct messages reused round-robin keeps generation cost and memory out of the measurement
+        count = args.messages * kiosks
+        products = [(product_id, product["product_name"]) for product_id, product in main.catalog.products.items()]
+        pool = list(synthetic_messages(min(count, 1000), args.mix, products, args.frame_kb, seed=args.seed, kiosks=kiosks))
+        messages = [pool[i % len(pool)] for i in range(count)]
+
+    handler = TimedHandler()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    rate = args.rate * kiosks
+    started = time.perf_counter()
+    # The handler logs every decision; keep that off the terminal while measuring
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        if args.mode == "broker":
+            sent = run_broker(messages, rate, handler, args.broker, args.port)
+        else:
+            sent = run_inprocess(messages, rate, handler)
+    elapsed = time.perf_counter() - started
+    wait_for_drain()
+
+    bus = main.event_bus.metrics()
+    report = {
+        "mode": args.mode,
+        "kiosks": kiosks,
+        "offered_rate": rate or None,
+        "sent": sent,
+        "handled": handler.handled,
+        "elapsed_s": round(elapsed, 3),
+        "messages_per_s": round(handler.handled / elapsed, 1) if elapsed else None,
+        "handler_latency": handler.histogram.snapshot(),
+        "emits": dict(emitter.counts),
+        "coalesced": {event: counts["coalesced"] for event, counts in bus["events"].items()},
+        "frames_skipped": sum(client["frames_skipped"] for client in bus["clients"].values()),
+        "frame_mb_emitted": round(emitter.bytes / 2 ** 20, 1),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "rss_growth_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 - rss_before, 1),
+        "subscriber_spans": main.tracer.snapshot(),
+    }
+    main.stop_services()
+    # Only after the interaction writer has stopped, so no WAL file is recreated
+    scratch.cleanup()
+    return report
+
+
+def print_scaling(reports):
+    # With --rate every kiosk offers the same load, so scaling is linear when each run keeps up with
+    # its offered rate and the handler latency stays flat as kiosks are added. Without --rate the
+    # runs measure saturation throughput, which must not drop as kiosks (rooms, cooldown state) are added.
+    base = reports[0]
+    if base["offered_rate"] is None:
+        print("No --rate: msgs/s is the saturation throughput of each run")
+    print("kiosks | offered msgs/s | handled msgs/s | kept up | p50 ms | p99 ms | p99 vs 1st | msgs/s vs 1st")
+    for report in reports:
+        latency = report["handler_latency"]
+        offered = report["offered_rate"]
+        kept_up = f"{report['messages_per_s'] / offered:.0%}" if offered else "-"
+        p99_ratio = latency["p99_ms"] / base["handler_latency"]["p99_ms"] if base["handler_latency"]["p99_ms"] else None
+        print(f"{report['kiosks']:>6} | {offered or 'max':>14} | {report['messages_per_s']:>14} | {kept_up:>7} | "
+              f"{latency['p50_ms']:>6} | {latency['p99_ms']:>6} | "
+              f"{f'{p99_ratio:.2f}' if p99_ratio is not None else '-':>10} | "
+              f"{report['messages_per_s'] / base['messages_per_s']:>13.2f}")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark the MQTT -> recommendation -> SocketIO path of main.py")
+    parser.add_argument("--mode", choices=["inprocess", "broker"], default="inprocess")
+    parser.add_argument("--broker", default="localhost", help="broker host for --mode broker and --record")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--messages", type=int, default=5000, help="synthetic messages to send per kiosk")
+    parser.add_argument("--rate", type=float, default=0, help="messages per second per kiosk, 0 = as fast as possible")
+    parser.add_argument("--kiosks", default="1", help="kiosk counts to run, e.g. 1,2,4,8 for a scaling test")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("detection=2,softdrink=1,video=7"))
+    parser.add_argument("--frame-kb", type=int, default=30, help="synthetic video frame size")
+    parser.add_argument("--replay", help="replay a recording instead of synthetic messages")
+    parser.add_argument("--record", help="record live camera/* traffic from --broker to this file and exit")
+    parser.add_argument("--duration", type=float, default=60, help="seconds to record for")
+    parser.add_argument("--clients", type=int, default=1, help="simulated browser clients per kiosk")
+    parser.add_argument("--cooldowns", action="store_true", help="keep the recommendation cooldowns (default: off, so every message can recommend)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the reports to this file")
+    parser.add_argument("--max-p50-ms", type=float)
+    parser.add_argument("--max-p99-ms", type=float)
+    parser.add_argument("--min-rate", type=float, help="minimum messages/s")
+    parser.add_argument("--max-rss-mb", type=float)
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.broker, args.port, args.record, args.duration)
+        return 0
+
+    reports = []
+    failures = []
+    for kiosks in (int(k) for k in args.kiosks.split(",")):
+        report = run_once(args, kiosks)
+        reports.append(report)
+        latency = report["handler_latency"]
+        print(f"📊 {kiosks} kiosk(s): {report['handled']}/{report['sent']} messages in {report['elapsed_s']} s: "
+              f"{report['messages_per_s']} msgs/s, p50 {latency['p50_ms']} ms, p99 {latency['p99_ms']} ms, "
+              f"max RSS {report['max_rss_mb']} MB")
+        print(f"📤 emits: {report['emits']} | coalesced: {report['coalesced']} | frames skipped: {report['frames_skipped']}")
+        failures += [f"{kiosks} kiosk(s): {failure}" for failure in check_thresholds(report, args)]
+    if len(reports) > 1:
+        print_scaling(reports)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reports if len(reports) > 1 else reports[0], f, indent=2)
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,99 @@
+import argparse
+import glob
+import hashlib
+import io
+import json
+import os
+import zipfile
+from PIL import Image, features
+
+# Builds fixed-size product thumbnails under static/thumbnails with content-hashed names,
+# plus a manifest mapping "<product name><bottle type>" (the scraped image file name) to the thumbnail.
+SOURCE_DIR = os.path.join("scraping", "images")
+SOURCE_ZIPS = os.path.join("scraping", "*.zip")
+OUTPUT_DIR = os.path.join("static", "thumbnails")
+MANIFEST_NAME = "manifest.json"
+THUMBNAIL_SIZE = 320
+
+
+def iter_sources(source_dir, zip_pattern):
+    # Yields (key, image bytes); loose files win over zipped copies of the same image
+    seen = set()
+    for path in sorted(glob.glob(os.path.join(source_dir, "*"))):
+        key, ext = os.path.splitext(os.path.basename(path))
+        if ext.lower() in (".jpg", ".jpeg", ".png", ".webp"):
+            seen.add(key)
+            with open(path, "rb") as f:
+                yield key, f.read()
+    for zip_path in sorted(glob.glob(zip_pattern)):
+        with zipfile.ZipFile(zip_path) as archive:
+            for name in sorted(archive.namelist()):
+                key, ext = os.path.splitext(os.path.basename(name))
+                if key and key not in seen and ext.lower() in (".jpg", ".jpeg", ".png", ".webp"):
+                    seen.add(key)
+                    yield key, archive.read(name)
+
+
+def render_thumbnail(data, size, image_format):
+    image = Image.open(io.BytesIO(data))
+    image = image.convert("RGBA") if image.mode in ("P", "LA", "RGBA") else image.convert("RGB")
+    image.thumbnail((size, size), Image.LANCZOS)
+    # Pad onto a white square so every card image has the same dimensions
+    canvas = Image.new("RGB", (size, size), (255, 255, 255))
+    offset = ((size - image.width) // 2, (size - image.height) // 2)
+    canvas.paste(image, offset, image if image.mode == "RGBA" else None)
+
+    output = io.BytesIO()
+    if image_format == "webp":
+        canvas.save(output, "WEBP", quality=80, method=6)
+    else:
+        canvas.save(output, "JPEG", quality=82, optimize=True, progressive=True)
+    return output.getvalue()
+
+
+def build(source_dir=SOURCE_DIR, zip_pattern=SOURCE_ZIPS, output_dir=OUTPUT_DIR, size=THUMBNAIL_SIZE):
+    image_format = "webp" if features.check("webp") else "jpg"
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    previous = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            previous = json.load(f).get("images", {})
+
+    images = {}
+    rendered = 0
+    for key, data in iter_sources(source_dir, zip_pattern):
+        source_hash = hashlib.sha1(data).hexdigest()
+        old = previous.get(key)
+        if old and old["source"] == source_hash and old["size"] == size and os.path.exists(os.path.join(output_dir, old["file"])):
+            images[key] = old
+            continue
+        try:
+            thumbnail = render_thumbnail(data, size, image_format)
+        except Exception as e:
+            print(f"⚠️ Skipping {key}: {e}")
+            continue
+        slug = "".join(c if c.isalnum() else "-" for c in key.lower()).strip("-")[:60]
+        file_name = f"{slug}.{hashlib.sha256(thumbnail).hexdigest()[:12]}.{image_format}"
+        with open(os.path.join(output_dir, file_name), "wb") as f:
+            f.write(thumbnail)
+        images[key] = {"file": file_name, "source": source_hash, "size": size}
+        rendered += 1
+
+    # Drop thumbnails no longer referenced by the manifest
+    keep = {entry["file"] for entry in images.values()} | {MANIFEST_NAME}
+    for name in os.listdir(output_dir):
+        if name not in keep:
+            os.remove(os.path.join(output_dir, name))
+
+    with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"size": size, "images": images}, f, indent=1, ensure_ascii=False)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    print(f"✅ {len(images)} thumbnails in {output_dir} ({rendered} rendered)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build local product thumbnails for the kiosk UI")
+    parser.add_argument("--size", type=int, default=THUMBNAIL_SIZE, help="thumbnail width and height in pixels")
+    args = parser.parse_args()
+    build(size=args.size)
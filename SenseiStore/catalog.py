@@ -0,0 +1,69 @@
+import json
+import os
+import numpy as np
+
+RECOMMENDATION_FIELDS = ['Product', 'Product_Image_Url', 'Product_Thumbnail_Url', 'Unit_Price']
+
+
+def load_thumbnails(manifest_path, url_prefix):
+    # {"<product name><bottle type>": thumbnail URL} from build_assets.py, empty if it has not been run
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, encoding="utf-8") as f:
+        images = json.load(f).get("images", {})
+    return {key: f"{url_prefix}/{entry['file']}" for key, entry in images.items()}
+
+
+def thumbnail_for(thumbnails, product, bottle_type):
+    return thumbnails.get(f"{product}{bottle_type}")
+
+
+class ProductCatalog:
+    # Built once at startup so the MQTT handler never scans the DataFrames
+    def __init__(self, product_df, sales_df, thumbnails=None, seed=None):
+        self.rng = np.random.default_rng(seed)
+        self.products = {}
+        for row in product_df.to_dict(orient='records'):
+            self.products[str(row['product_id'])] = row
+
+        # Distinct products from the sales history, stored once; brands hold index arrays into it
+        distinct_products = sales_df.drop_duplicates('Product')
+        thumbnails = thumbnails or {}
+        distinct_products = distinct_products.assign(Product_Thumbnail_Url=[
+            thumbnail_for(thumbnails, product, bottle_type)
+            for product, bottle_type in zip(distinct_products['Product'], distinct_products['Product_Bottle_Type'])
+        ])
+        self.items = distinct_products[RECOMMENDATION_FIELDS].to_dict(orient='records')
+        self.item_index = {item['Product']: i for i, item in enumerate(self.items)}
+
+        brands = distinct_products['Product_Company'].to_numpy()
+        self.brand_items = {}
+        for brand in dict.fromkeys(brands):
+            self.brand_items[brand] = np.flatnonzero(brands == brand)
+
+    def get_product(self, product_id):
+        return self.products.get(str(product_id))
+
+    def get_brand(self, product_id):
+        product = self.get_product(product_id)
+        if product is None:
+            return None
+        return product['product_company']
+
+    def get_brand_products(self, brand):
+        return [self.items[i] for i in self.brand_items.get(brand, ())]
+
+    def get_brand_recommendations(self, product_id, n=6):
+        product = self.get_product(product_id)
+        if product is None:
+            return []
+
+        candidates = self.brand_items.get(product['product_company'])
+        if candidates is None:
+            return []
+        held = self.item_index.get(product['product_name'])
+        if held is not None:
+            candidates = candidates[candidates != held]
+
+        picks = self.rng.choice(candidates, size=min(n, len(candidates)), replace=False)
+        return [self.items[i] for i in picks]
@@ -0,0 +1,206 @@
+import threading
+import time
+from collections import deque
+from tracing import Tracer
+
+
+class ClientState:
+    __slots__ = ("sid", "room", "last_frame_seq", "in_flight_seq", "in_flight_since", "frames_sent", "frames_skipped",
+                 "ack_timeouts", "lag_ms", "last_lag_ms")
+
+    def __init__(self, sid, room, last_frame_seq):
+        self.sid = sid
+        self.room = room
+        self.last_frame_seq = last_frame_seq
+        self.in_flight_seq = None
+        self.in_flight_since = 0.0
+        self.frames_sent = 0
+        self.frames_skipped = 0
+        self.ack_timeouts = 0
+        self.lag_ms = 0.0
+        self.last_lag_ms = 0.0
+
+
+class FrameSlot:
+    __slots__ = ("seq", "frame", "received_at")
+
+    def __init__(self):
+        self.seq = 0
+        self.frame = None
+        self.received_at = 0.0
+
+
+class EventBus:
+    # Sits between the MQTT callback and SocketIO: the MQTT thread only stores data here,
+    # a single worker thread does every emit.
+    # Every room (one per kiosk) has a latest-value-only video frame slot; each client in the room gets
+    # the newest frame once it has acknowledged the previous one, so a slow browser skips frames
+    # instead of queueing them.
+    # Events listed in rate_limits are coalesced per room to the latest payload and sent at most once per interval.
+    def __init__(self, socketio, rate_limits=None, ack_timeout=2.0, lag_smoothing=0.2, tracer=None):
+        self.socketio = socketio
+        self.tracer = tracer or Tracer()
+        self.rate_limits = dict(rate_limits or {})
+        self.ack_timeout = ack_timeout
+        self.lag_smoothing = lag_smoothing
+        self.condition = threading.Condition()
+        self.clients = {}
+        self.frames = {}
+        self.events = deque()
+        self.throttled = {}
+        self.last_sent = {}
+        self.event_counts = {}
+        self.stopped = False
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def connect(self, sid, room=None):
+        with self.condition:
+            # A new client starts at the current frame rather than counting earlier ones as skipped
+            slot = self.frames.setdefault(room, FrameSlot())
+            self.clients[sid] = ClientState(sid, room, slot.seq - 1 if slot.frame is not None else 0)
+            self.condition.notify()
+
+    def disconnect(self, sid):
+        with self.condition:
+            self.clients.pop(sid, None)
+
+    def publish_frame(self, frame, room=None):
+        with self.condition:
+            slot = self.frames.get(room)
+            if slot is None:
+                slot = self.frames[room] = FrameSlot()
+            slot.frame = frame
+            slot.seq += 1
+            slot.received_at = time.time()
+            self.condition.notify()
+
+    def emit(self, event, data, room=None):
+        # room=None broadcasts to every client
+        with self.condition:
+            counts = self._counts(event)
+            if event in self.rate_limits:
+                if (event, room) in self.throttled:
+                    counts["coalesced"] += 1
+                self.throttled[(event, room)] = data
+            else:
+                self.events.append((event, room, data))
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                if self.stopped:
+                    return
+                events, frames, wait = self._collect(time.time())
+                if not events and not frames:
+                    self.condition.wait(wait)
+                    continue
+            # A failed emit is logged and counted; it must never take the only worker thread down with it
+            for event, room, data in events:
+                try:
+                    with self.tracer.span(f"emit.{event}"):
+                        self.socketio.emit(event, data, to=room)
+                    with self.condition:
+                        self._counts(event)["sent"] += 1
+                except Exception as e:
+                    self._emit_failed(event, e)
+            for sid, seq, frame, received_at in frames:
+                try:
+                    with self.tracer.span("emit.stream_frame"):
+                        self.socketio.emit('stream_frame', frame, to=sid,
+                                           callback=lambda *args, sid=sid, seq=seq, received_at=received_at: self._ack(sid, seq, received_at))
+                except Exception as e:
+                    self._emit_failed('stream_frame', e)
+                    # No ack will come for this frame, so the client may get the next one right away
+                    with self.condition:
+                        client = self.clients.get(sid)
+                        if client is not None and client.in_flight_seq == seq:
+                            client.in_flight_seq = None
+
+    def _collect(self, now):
+        # Called with the lock held: returns (events due, frames due, seconds until something may be due)
+        events = list(self.events)
+        self.events.clear()
+        wait = None
+
+        for (event, room), data in list(self.throttled.items()):
+            due = self.last_sent.get((event, room), 0.0) + self.rate_limits[event]
+            if now >= due:
+                del self.throttled[(event, room)]
+                self.last_sent[(event, room)] = now
+                events.append((event, room, data))
+            else:
+                wait = due - now if wait is None else min(wait, due - now)
+
+        frames = []
+        for client in self.clients.values():
+            if client.in_flight_seq is not None:
+                if now - client.in_flight_since < self.ack_timeout:
+                    remaining = client.in_flight_since + self.ack_timeout - now
+                    wait = remaining if wait is None else min(wait, remaining)
+                    continue
+                # Lost or very late ack: stop waiting for it
+                client.ack_timeouts += 1
+                client.in_flight_seq = None
+            slot = self.frames.get(client.room)
+            if slot is None or slot.frame is None or client.last_frame_seq >= slot.seq:
+                continue
+            client.frames_skipped += slot.seq - client.last_frame_seq - 1
+            client.last_frame_seq = slot.seq
+            client.in_flight_seq = slot.seq
+            client.in_flight_since = now
+            client.frames_sent += 1
+            frames.append((client.sid, slot.seq, slot.frame, slot.received_at))
+        return events, frames, wait
+
+    def _ack(self, sid, seq, received_at):
+        with self.condition:
+            client = self.clients.get(sid)
+            if client is None or client.in_flight_seq != seq:
+                return
+            # Lag covers the wait in the bus, delivery and the browser handling the frame
+            client.last_lag_ms = (time.time() - received_at) * 1000
+            self.tracer.observe("frame_ack", client.last_lag_ms)
+            client.lag_ms += self.lag_smoothing * (client.last_lag_ms - client.lag_ms) if client.lag_ms else client.last_lag_ms
+            client.in_flight_seq = None
+            self.condition.notify()
+
+    def _emit_failed(self, event, error):
+        print(f"❌ Failed to emit {event}:", error)
+        with self.condition:
+            self._counts(event)["failed"] += 1
+
+    def _counts(self, event):
+        return self.event_counts.setdefault(event, {"sent": 0, "coalesced": 0, "failed": 0})
+
+    def metrics(self):
+        with self.condition:
+            return {
+                "clients": {
+                    client.sid: {
+                        "room": client.room,
+                        "frames_sent": client.frames_sent,
+                        "frames_skipped": client.frames_skipped,
+                        "frames_behind": self.frames[client.room].seq - client.last_frame_seq,
+                        "ack_timeouts": client.ack_timeouts,
+                        "lag_ms": round(client.lag_ms, 1),
+                        "last_lag_ms": round(client.last_lag_ms, 1),
+                    }
+                    for client in self.clients.values()
+                },
+                "frames_received": {room: slot.seq for room, slot in self.frames.items()},
+                "events": {event: dict(counts) for event, counts in self.event_counts.items()},
+                "queue_depth": len(self.events) + len(self.throttled),
+            }
@@ -0,0 +1,34 @@
+import struct
+import time
+
+# camera/videostreaming payload: fixed header followed by the raw JPEG bytes.
+# magic, version, flags, header size, capture time (epoch seconds), sequence, width, height
+MAGIC = b'SSVF'
+VERSION = 1
+HEADER = struct.Struct('!4sBBHdIHH')
+HEADER_SIZE = HEADER.size
+
+
+def pack_frame(jpeg_bytes, sequence, width, height, timestamp=None, flags=0):
+    if timestamp is None:
+        timestamp = time.time()
+    header = HEADER.pack(MAGIC, VERSION, flags, HEADER_SIZE, timestamp, sequence & 0xFFFFFFFF, width, height)
+    return header + jpeg_bytes
+
+
+def unpack_header(payload):
+    if len(payload) < HEADER_SIZE:
+        raise ValueError("Frame payload shorter than header")
+    magic, version, flags, header_size, timestamp, sequence, width, height = HEADER.unpack_from(payload)
+    if magic != MAGIC:
+        raise ValueError("Not a binary video frame")
+    if version != VERSION:
+        raise ValueError(f"Unsupported frame protocol version {version}")
+    return {
+        "header_size": header_size,
+        "flags": flags,
+        "timestamp": timestamp,
+        "seq": sequence,
+        "width": width,
+        "height": height,
+    }
@@ -0,0 +1,61 @@
+import os
+import cv2
+import numpy as np
+from ultralytics import YOLO
+
+# Export formats ultralytics can load back through YOLO() for CPU inference
+EXPORT_SUFFIXES = {
+    "onnx": ".onnx",
+    "openvino": "_openvino_model",
+}
+
+
+def load_detector(weights_path, runtime="pytorch", imgsz=256):
+    # runtime="onnx"/"openvino" exports the .pt once (dynamic batch) and loads the exported model
+    if runtime == "pytorch":
+        return YOLO(weights_path)
+    if runtime not in EXPORT_SUFFIXES:
+        raise ValueError(f"Unknown inference runtime '{runtime}'")
+
+    exported_path = os.path.splitext(weights_path)[0] + EXPORT_SUFFIXES[runtime]
+    if not os.path.exists(exported_path):
+        print(f"📦 Exporting {weights_path} to {runtime}...")
+        try:
+            exported_path = YOLO(weights_path).export(format=runtime, imgsz=imgsz, dynamic=True)
+        except Exception as e:
+            print(f"⚠️ Export to {runtime} failed, using PyTorch weights:", e)
+            return YOLO(weights_path)
+    return YOLO(exported_path, task="detect")
+
+
+class EmotionBatcher:
+    # Runs DeepFace's emotion model on many face crops in one forward pass.
+    # Preprocessing mirrors DeepFace.analyze(detector_backend='skip'): scale to 0-1,
+    # letterbox to 224x224, grayscale, resize to 48x48.
+    def __init__(self):
+        from deepface import DeepFace
+        from deepface.models.demography.Emotion import labels
+        self.client = DeepFace.build_model("Emotion", task="facial_attribute")
+        self.labels = labels
+
+    def preprocess(self, crop, target=224):
+        face = crop.astype(np.float32) / 255
+        h, w = face.shape[:2]
+        factor = min(target / h, target / w)
+        face = cv2.resize(face, (int(w * factor), int(h * factor)))
+        pad_h = target - face.shape[0]
+        pad_w = target - face.shape[1]
+        face = np.pad(face, ((pad_h // 2, pad_h - pad_h // 2), (pad_w // 2, pad_w - pad_w // 2), (0, 0)))
+        gray = cv2.cvtColor(face, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(gray, (48, 48))
+
+    def analyze(self, crops):
+        if not crops:
+            return []
+        batch = np.stack([self.preprocess(crop) for crop in crops])[..., np.newaxis]
+        predictions = self.client.model(batch, training=False).numpy()
+        results = []
+        for prediction in predictions:
+            total = prediction.sum()
+            results.append({label: float(100 * p / total) for label, p in zip(self.labels, prediction)})
+        return results
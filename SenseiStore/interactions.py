@@ -0,0 +1,171 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import closing
+
+# One row per detection, pickup or recommendation a kiosk saw. Images are never stored, recommendations
+# keep only the product names, so a row is a few dozen bytes.
+COLUMNS = ("ts", "kiosk_id", "kind", "emotion", "product_id", "brand", "track_id", "confidence", "products")
+QUERY_FILTERS = ("kiosk_id", "kind", "emotion", "product_id")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS interactions (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    kiosk_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    emotion TEXT,
+    product_id TEXT,
+    brand TEXT,
+    track_id INTEGER,
+    confidence REAL,
+    products TEXT
+);
+CREATE INDEX IF NOT EXISTS interactions_ts ON interactions (ts);
+CREATE INDEX IF NOT EXISTS interactions_kiosk_ts ON interactions (kiosk_id, ts);
+CREATE INDEX IF NOT EXISTS interactions_emotion_ts ON interactions (emotion, ts) WHERE emotion IS NOT NULL;
+CREATE INDEX IF NOT EXISTS interactions_product_ts ON interactions (product_id, ts) WHERE product_id IS NOT NULL;
+"""
+
+
+def connect(path):
+    conn = sqlite3.connect(path, timeout=10)
+    # WAL lets the API read while the writer appends; NORMAL sync is durable across app crashes
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class InteractionLog:
+    # record() only appends to an in-memory queue, so the MQTT callback never waits on disk.
+    # A background writer inserts the queue in batches, one transaction each, and once an hour
+    # deletes rows older than retention_days and returns the freed pages to the file system.
+    def __init__(self, path, retention_days=90, batch_size=500, flush_interval=1.0, max_queue=20000,
+                 compact_interval=3600):
+        self.path = path
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.compact_interval = compact_interval
+        self.queue = deque()
+        self.wake = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.counters = {"recorded": 0, "written": 0, "dropped": 0, "batches": 0, "failed_batches": 0,
+                         "compacted_rows": 0}
+        with closing(sqlite3.connect(path)) as conn:
+            # Must be set before the first table exists for incremental_vacuum to work
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        with closing(connect(path)) as conn:
+            conn.executescript(SCHEMA)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        self.stop_event.set()
+        self.wake.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def record(self, kind, kiosk_id, emotion=None, product_id=None, brand=None, track_id=None,
+               confidence=None, products=None, ts=None):
+        # products: recommended items (dicts with 'Product') or names
+        if len(self.queue) >= self.max_queue:
+            self.counters["dropped"] += 1
+            return False
+        if products is not None:
+            products = json.dumps([p["Product"] if isinstance(p, dict) else p for p in products])
+        self.queue.append((
+            time.time() if ts is None else ts, kiosk_id, kind, emotion,
+            None if product_id is None else str(product_id), brand, track_id, confidence, products,
+        ))
+        self.counters["recorded"] += 1
+        if len(self.queue) >= self.batch_size:
+            self.wake.set()
+        return True
+
+    def run(self):
+        conn = connect(self.path)
+        last_compacted = time.monotonic()
+        try:
+            while not self.stop_event.is_set():
+                self.wake.wait(self.flush_interval)
+                self.wake.clear()
+                self.flush(conn)
+                if time.monotonic() - last_compacted >= self.compact_interval:
+                    self.compact(conn)
+                    last_compacted = time.monotonic()
+            self.flush(conn)
+        finally:
+            conn.close()
+
+    def flush(self, conn):
+        while self.queue:
+            batch = []
+            while self.queue and len(batch) < self.batch_size:
+                batch.append(self.queue.popleft())
+            try:
+                with conn:
+                    conn.executemany(
+                        f"INSERT INTO interactions ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                        batch,
+                    )
+                self.counters["written"] += len(batch)
+                self.counters["batches"] += 1
+            except sqlite3.Error as e:
+                self.counters["failed_batches"] += 1
+                print("❌ Failed to write interactions:", e)
+
+    def compact(self, conn):
+        if not self.retention_days:
+            return
+        try:
+            with conn:
+                deleted = conn.execute(
+                    "DELETE FROM interactions WHERE ts < ?", (time.time() - self.retention_days * 86400,)
+                ).rowcount
+            if deleted:
+                # executescript steps the pragma to completion; execute() frees a single page
+                conn.executescript("PRAGMA incremental_vacuum;")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self.counters["compacted_rows"] += deleted
+        except sqlite3.Error as e:
+            print("❌ Failed to compact interactions:", e)
+
+    def query(self, since=None, until=None, limit=100, **filters):
+        # Newest first. filters: any of QUERY_FILTERS; each combination with a time range hits an index.
+        clauses, params = [], []
+        for name, value in filters.items():
+            if name not in QUERY_FILTERS:
+                raise ValueError(f"Unknown interaction filter '{name}'")
+            if value is not None:
+                clauses.append(f"{name} = ?")
+                params.append(str(value))
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts < ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with closing(connect(self.path)) as conn:
+            rows = conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM interactions {where} ORDER BY ts DESC LIMIT ?",
+                params + [limit],
+            ).fetchall()
+        events = []
+        for row in rows:
+            event = {name: value for name, value in zip(COLUMNS, row) if value is not None}
+            if "products" in event:
+                event["products"] = json.loads(event["products"])
+            events.append(event)
+        return events
+
+    def metrics(self):
+        return dict(self.counters, queue_depth=len(self.queue))
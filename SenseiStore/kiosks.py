@@ -0,0 +1,102 @@
+import threading
+import time
+
+# Publishers send on camera/<kiosk_id>/<kind>; the original single-camera topics camera/<kind>
+# are still accepted and belong to DEFAULT_KIOSK.
+DEFAULT_KIOSK = "default"
+KINDS = ("detection", "videostreaming", "softdrink", "metrics")
+
+
+def parse_topic(topic):
+    # "camera/kiosk-3/detection" -> ("kiosk-3", "detection"), "camera/detection" -> ("default", "detection")
+    parts = topic.split("/")
+    if len(parts) == 2:
+        return DEFAULT_KIOSK, parts[1]
+    if len(parts) == 3:
+        return parts[1], parts[2]
+    return None, None
+
+
+def kiosk_topic(kiosk_id, kind):
+    return f"camera/{kiosk_id}/{kind}"
+
+
+class KioskState:
+    # Cooldown state of one kiosk; the lock keeps check-and-set atomic when MQTT callbacks overlap
+    __slots__ = ("lock", "last_emotion", "emotion_time", "last_brand", "brand_time", "messages", "track_emotions")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.last_emotion = None
+        self.emotion_time = 0.0
+        self.last_brand = None
+        self.brand_time = 0.0
+        self.messages = 0
+        # Last emotion per face track, oldest track first
+        self.track_emotions = {}
+
+
+class KioskRegistry:
+    def __init__(self, emotion_cooldown=7, brand_cooldown=7):
+        self.emotion_cooldown = emotion_cooldown
+        self.brand_cooldown = brand_cooldown
+        self.lock = threading.Lock()
+        self.kiosks = {}
+
+    def get(self, kiosk_id):
+        state = self.kiosks.get(kiosk_id)
+        if state is None:
+            with self.lock:
+                state = self.kiosks.setdefault(kiosk_id, KioskState())
+        return state
+
+    def should_update_recommendation(self, kiosk_id, emotion, now=None):
+        # A new emotion, and the kiosk's last emotion recommendation is older than the cooldown
+        state = self.get(kiosk_id)
+        now = time.time() if now is None else now
+        with state.lock:
+            if emotion != state.last_emotion and now - state.emotion_time > self.emotion_cooldown:
+                state.last_emotion = emotion
+                state.emotion_time = now
+                return True
+        return False
+
+    def should_recommend_brand(self, kiosk_id, brand, now=None):
+        # A different brand, or the same one again once the cooldown has passed
+        state = self.get(kiosk_id)
+        now = time.time() if now is None else now
+        with state.lock:
+            if brand != state.last_brand or now - state.brand_time > self.brand_cooldown:
+                state.last_brand = brand
+                state.brand_time = now
+                return True
+        return False
+
+    def track_emotion_changed(self, kiosk_id, track_id, emotion, max_tracks=64):
+        # True the first time a face track reports an emotion and whenever it reports a different one
+        state = self.get(kiosk_id)
+        with state.lock:
+            if track_id in state.track_emotions and state.track_emotions[track_id] == emotion:
+                return False
+            state.track_emotions.pop(track_id, None)
+            state.track_emotions[track_id] = emotion
+            if len(state.track_emotions) > max_tracks:
+                del state.track_emotions[next(iter(state.track_emotions))]
+        return True
+
+    def count_message(self, kiosk_id):
+        state = self.get(kiosk_id)
+        with state.lock:
+            state.messages += 1
+
+    def snapshot(self):
+        with self.lock:
+            kiosks = dict(self.kiosks)
+        return {
+            kiosk_id: {
+                "messages": state.messages,
+                "last_emotion": state.last_emotion,
+                "last_brand": state.last_brand,
+            }
+            for kiosk_id, state in kiosks.items()
+        }
@@ -1,152 +1,315 @@
-from flask import Flask, render_template
+from flask import Flask, render_template, jsonify, send_from_directory, request, abort
 from flask_mqtt import Mqtt
-from flask_socketio import SocketIO
+from flask_socketio import SocketIO, join_room
 import json
-import pandas as pd
 import random
 import time
 import os 
-import playsound
-import threading
-from gtts import gTTS
-from datetime import datetime
+import speech
+import frame_protocol
+from tracing import Tracer
+from event_bus import EventBus
+from kiosks import DEFAULT_KIOSK, KioskRegistry, parse_topic
+from catalog import ProductCatalog, load_thumbnails
+from recommender import EmotionRecommender
+from analytics import DIMENSIONS, METRICS, SalesAnalytics, CachedResponses
+from sales_feed import SalesFileWatcher
+from interactions import QUERY_FILTERS, InteractionLog
+from scraping import datastore
 
 app = Flask(__name__)
-app.config['MQTT_BROKER_URL'] = '192.168.238.123'
-app.config['MQTT_BROKER_PORT'] = 1883
-app.config['MQTT_TOPICS'] = ['camera/detection', 'camera/videostreaming', 'camera/softdrink']
+app.config['MQTT_BROKER_URL'] = os.environ.get('MQTT_BROKER_URL', '192.168.238.123')
+app.config['MQTT_BROKER_PORT'] = int(os.environ.get('MQTT_BROKER_PORT', 1883))
+# camera/<kiosk_id>/<kind> from every publisher, plus the original single-kiosk camera/<kind> topics
+app.config['MQTT_TOPICS'] = ['camera/+/+', 'camera/+']
+app.config['TTS_CACHE_DIR'] = 'tts_cache'
+app.config['TTS_CACHE_MAX_ENTRIES'] = 2000
+app.config['TTS_BACKEND'] = 'gtts'
+app.config['TTS_FALLBACK_BACKEND'] = 'espeak'
+app.config['TTS_WARM_UP'] = True
+app.config['TTS_COOLDOWN_PERIOD'] = 7
+app.config['TTS_QUEUE_SIZE'] = 4
+app.config['TTS_MAX_AGE'] = 5
+# The server has one speaker: None speaks for every kiosk, a list limits speech to those kiosks
+app.config['TTS_KIOSKS'] = None
+app.config['EMOTION_COOLDOWN_PERIOD'] = 7
+app.config['BRAND_COOLDOWN_PERIOD'] = 7
+# Minimum seconds between emits of these events; in between only the latest payload is kept
+app.config['SOCKETIO_RATE_LIMITS'] = {'mqtt_message': 0.5, 'softdrink': 0.5}
+app.config['SOCKETIO_ACK_TIMEOUT'] = 2
+app.config['THUMBNAIL_DIR'] = os.path.join('static', 'thumbnails')
+app.config['THUMBNAIL_MAX_AGE'] = 365 * 24 * 3600
+app.config['SALES_CSV_PATH'] = 'scraping/synthetic_sales_data.csv'
+app.config['PRODUCT_CSV_PATH'] = 'scraping/drinks_content_edited.csv'
+app.config['INTERACTION_DB_PATH'] = 'interactions.db'
+app.config['INTERACTION_RETENTION_DAYS'] = 180
 
-mqtt = Mqtt(app)
+# The broker connection is only made in start_mqtt(), so the handler can be imported and driven offline
+mqtt = Mqtt()
 socketio = SocketIO(app)
+# Subscriber-side latency histograms; each publisher's own arrive on camera/<kiosk_id>/metrics
+tracer = Tracer()
+publisher_metrics = {}
+# Cooldown state per kiosk
+kiosks = KioskRegistry(app.config['EMOTION_COOLDOWN_PERIOD'], app.config['BRAND_COOLDOWN_PERIOD'])
 
-cooldown = {"last_emotion": None, "last_time": 0, "cooldown_period": 7}
-brand_cooldown = {"last_brand": None, "last_time": 0, "cooldown_period": 7}
-tts_cooldown = {"last_tts_time": 0, "cooldown_period": 7}
-
-def should_speak():
-    now = time.time()
-    if (now - tts_cooldown["last_tts_time"]) > tts_cooldown["cooldown_period"]:
-        tts_cooldown["last_tts_time"] = now
+def should_recommend_brand(kiosk_id, current_brand):
+    if kiosks.should_recommend_brand(kiosk_id, current_brand):
+        print(f"✅ [{kiosk_id}] New Brand Detected: {current_brand}")
         return True
+    print(f"⏭️ [{kiosk_id}] Skipping Brand: {current_brand} (Same or cooldown)")
     return False
 
-def should_recommend_brand(current_brand):
-    now = time.time()
-    if current_brand != brand_cooldown["last_brand"] or (now - brand_cooldown["last_time"] > brand_cooldown["cooldown_period"]):
-        print(f"✅ New Brand Detected: {current_brand}")
-        brand_cooldown["last_brand"] = current_brand
-        brand_cooldown["last_time"] = now
+def should_update_recommendation(kiosk_id, current_emotion):
+    if kiosks.should_update_recommendation(kiosk_id, current_emotion):
+        print(f"✅ [{kiosk_id}] New Emotion Detected: {current_emotion}")
         return True
-    else:
-        print(f"⏭️ Skipping Brand: {current_brand} (Same or cooldown)")
+    print(f"⏭️ [{kiosk_id}] Skipping Emotion: {current_emotion} (Same or cooldown)")
     return False
 
-def should_update_recommendation(current_emotion):
-    now = time.time()
-    if current_emotion != cooldown["last_emotion"] and (now - cooldown["last_time"] > cooldown["cooldown_period"]):
-        print(f"✅ New Emotion Detected: {current_emotion}")
-        cooldown["last_emotion"] = current_emotion
-        cooldown["last_time"] = now
-        return True
-    else:
-        print(f"⏭️ Skipping Emotion: {current_emotion} (Same or cooldown)")
-    return False
+def should_speak(kiosk_id):
+    return app.config['TTS_KIOSKS'] is None or kiosk_id in app.config['TTS_KIOSKS']
 
 def get_brand_recommendations(product_id):
-    product_row = product_df[product_df['product_id'].astype(str) == str(product_id)]
-    if product_row.empty:
-        return []
-
-    brand = product_row['product_company'].values[0]
-    similar_products = sales_df[
-        (sales_df['Product_Company'] == brand) &
-        (product_df['product_id'].astype(str) != str(product_id))
-    ].drop_duplicates('Product')
-
-    recommendations = similar_products.sample(n=min(6, len(similar_products)))
-    return recommendations[['Product', 'Product_Image_Url', 'Unit_Price']].to_dict(orient='records')
+    with tracer.span("recommend.brand"):
+        return catalog.get_brand_recommendations(product_id, n=6)
 
 def get_recommendation_by_emotion(emotion):
-    subset = sales_df.sample(6)
-    return subset[['Product', 'Product_Image_Url', 'Unit_Price']].to_dict(orient='records')
+    with tracer.span("recommend.emotion"):
+        return recommender.recommend(emotion, n=6)
 
 def speak_recommendation(emotion, first_item):
-    recommendations = {
-        "happy": f"You seem happy! We recommend trying our {first_item} ",
-        "sad": f"You seem a little down — maybe a refreshing {first_item} can lift your mood.",
-        "angry": f"Feeling frustrated? A cold {first_item} might help cool things down.",
-        "surprise": f"Looks like that caught your attention! {first_item} is full of surprises",
-        "disgust": f"Not your vibe? No worries — we’ve got 9 other drinks that might be a better match than {first_item}.",
-        "fear": f"Not sure about that one? {first_item} is a safe choice",
-        "neutral": f"Hard to tell what you think — maybe {first_item} will change your mind?"
-    }
-    message = recommendations.get(emotion, "Try one of our top drinks today!")
-    try:
-        filename = f"{datetime.now().strftime('%Y%m%d%H%M%S')}_rec.mp3"
-        tts = gTTS(text=message, lang='en')
-        tts.save(filename)
-        playsound.playsound(filename)
-        os.remove(filename)
-    except Exception as e:
-        print("🔊 TTS Error:", e)
+    return speech_scheduler.submit(speech.recommendation_phrase(emotion, first_item), "emotion", speech.PRIORITY_EMOTION)
 
 def speak_brand_recommendation(brand_name):
-    try:
-        message = f"You seem to be interested in {brand_name}. How about these few?"
-        filename = f"{datetime.now().strftime('%Y%m%d%H%M%S')}_brand.mp3"
-        tts = gTTS(text=message, lang='en')
-        tts.save(filename)
-        playsound.playsound(filename)
-        os.remove(filename)
-    except Exception as e:
-        print("🔊 TTS Error:", e)
+    return speech_scheduler.submit(speech.brand_phrase(brand_name), "brand", speech.PRIORITY_BRAND)
+
+def observe_transit(kind, captured_at):
+    # Capture on the Pi to receipt here; only meaningful when both clocks are NTP-synced
+    if captured_at:
+        tracer.observe(f"transit.{kind}", (time.time() - captured_at) * 1000)
 
 @mqtt.on_message()
 def handle_mqtt_message(client, userdata, message):
+    started = time.perf_counter()
+    # Everything a kiosk publishes is emitted only to that kiosk's SocketIO room
+    kiosk_id, kind = parse_topic(message.topic)
     try:
+        if kiosk_id is None:
+            return
+        kiosks.count_message(kiosk_id)
+
+        # Video frames are binary: forward the raw bytes as a SocketIO attachment, no decoding
+        if kind == 'videostreaming':
+            header = frame_protocol.unpack_header(message.payload)
+            observe_transit(kind, header['timestamp'])
+            event_bus.publish_frame(dict(header, frame=message.payload), room=kiosk_id)
+            return
+
         payload = json.loads(message.payload.decode())
-        topic = message.topic
+        observe_transit(kind, payload.get('captured_at'))
+        payload['kiosk_id'] = kiosk_id
 
-        if topic == 'camera/detection':
-            if should_update_recommendation(payload['emotion']):
+        if kind == 'metrics':
+            publisher_metrics[kiosk_id] = payload
+            return
+
+        if kind == 'detection':
+            # Publishers send every tracked face on every frame; only emotion changes and accepted
+            # recommendations make it into the interaction history
+            emotion_changed = kiosks.track_emotion_changed(kiosk_id, payload.get('track_id'), payload['emotion'])
+            recommend = should_update_recommendation(kiosk_id, payload['emotion'])
+            if emotion_changed or recommend:
+                interaction_log.record('detection', kiosk_id, emotion=payload['emotion'],
+                                       track_id=payload.get('track_id'), confidence=payload.get('confidence_score'))
+            if recommend:
                 recommended_items = get_recommendation_by_emotion(payload['emotion'])
-                socketio.emit('emotion_recommendation', {
+                interaction_log.record('emotion_recommendation', kiosk_id, emotion=payload['emotion'],
+                                       products=recommended_items)
+                event_bus.emit('emotion_recommendation', {
+                    "kiosk_id": kiosk_id,
                     "emotion": payload['emotion'],
                     "recommendations": recommended_items
-                })
-                if recommended_items and should_speak():
-                    first_item = recommended_items[0]['Product']
-                    threading.Thread(target=speak_recommendation, args=(payload['emotion'], first_item), daemon=True).start()
-            socketio.emit('mqtt_message', payload)
-
-        elif topic == 'camera/videostreaming':
-            socketio.emit('stream_frame', payload)
+                }, room=kiosk_id)
+                if recommended_items and should_speak(kiosk_id):
+                    speak_recommendation(payload['emotion'], recommended_items[0]['Product'])
+            event_bus.emit('mqtt_message', payload, room=kiosk_id)
 
-        if topic == 'camera/softdrink':
-            socketio.emit('softdrink', payload)
+        elif kind == 'softdrink':
+            # Publishers vote over frames and send pickup_started once per pickup, then holding heartbeats
+            # and released; messages without an event field come from older publishers, one per frame
+            event = payload.get('event', 'pickup_started')
             product_id = payload['product_id']
-            product_row = product_df[product_df['product_id'].astype(str) == str(product_id)]
-            if not product_row.empty:
-                brand = product_row['product_company'].values[0]
-                if should_recommend_brand(brand) and should_speak():
+            if event == 'holding':
+                return
+            if event == 'released':
+                interaction_log.record('softdrink_released', kiosk_id, product_id=product_id,
+                                       confidence=payload.get('confidence_score'))
+                return
+            event_bus.emit('softdrink', payload, room=kiosk_id)
+            brand = catalog.get_brand(product_id)
+            interaction_log.record('softdrink', kiosk_id, product_id=product_id, brand=brand,
+                                   confidence=payload.get('confidence_score'))
+            if brand is not None:
+                if should_recommend_brand(kiosk_id, brand):
                     brand_recommendations = get_brand_recommendations(product_id)
-                    socketio.emit('product_recommendation', {
+                    interaction_log.record('product_recommendation', kiosk_id, product_id=product_id, brand=brand,
+                                           products=brand_recommendations)
+                    event_bus.emit('product_recommendation', {
+                        "kiosk_id": kiosk_id,
                         "product_id": product_id,
                         "brand": brand,
                         "recommendations": brand_recommendations
-                    })
-                    threading.Thread(target=speak_brand_recommendation, args=(brand,), daemon=True).start()
+                    }, room=kiosk_id)
+                    if should_speak(kiosk_id):
+                        speak_brand_recommendation(brand)
 
     except Exception as e:
         print("❌ Failed to process MQTT message:", e)
+    finally:
+        tracer.observe_since(f"receive.{kind}", started)
+
+@socketio.on('connect')
+def handle_connect():
+    # Displays pick their kiosk with /?kiosk=<kiosk_id>
+    kiosk_id = request.args.get('kiosk') or DEFAULT_KIOSK
+    join_room(kiosk_id)
+    event_bus.connect(request.sid, kiosk_id)
+
+@socketio.on('disconnect')
+def handle_disconnect():
+    event_bus.disconnect(request.sid)
 
 @app.route('/')
 def index():
-    return render_template('index.html')
+    return render_template('index.html', kiosk_id=request.args.get('kiosk') or DEFAULT_KIOSK)
 
-if __name__ == '__main__':
-    sales_df = pd.read_csv("scraping/synthetic_sales_data.csv", encoding="utf-8")
-    product_df = pd.read_csv("scraping/drinks_content_edited.csv", encoding="utf-8")
+# Thumbnail names carry a content hash, so browsers may cache them forever
+@app.route('/thumbnails/<path:filename>')
+def thumbnail(filename):
+    response = send_from_directory(app.config['THUMBNAIL_DIR'], filename, max_age=app.config['THUMBNAIL_MAX_AGE'])
+    response.headers['Cache-Control'] = f"public, max-age={app.config['THUMBNAIL_MAX_AGE']}, immutable"
+    return response
+
+@app.route('/speech/metrics')
+def speech_metrics():
+    return jsonify(speech_scheduler.metrics())
+
+@app.route('/socketio/metrics')
+def socketio_metrics():
+    return jsonify(event_bus.metrics())
+
+def analytics_response(key, build):
+    # Answers from the serialized cache; unchanged data gets a 304 for the browser's If-None-Match
+    body, etag = analytics_responses.get(key, build)
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+def top_query():
+    metric = request.args.get('metric', 'revenue')
+    if metric not in METRICS:
+        abort(400, f"metric must be one of {', '.join(METRICS)}")
+    n = min(max(request.args.get('n', 10, type=int), 1), 100)
+    return metric, n
+
+@app.route('/analytics/summary')
+def analytics_summary():
+    return analytics_response(('summary',), lambda: dict(
+        {"totals": analytics.totals()}, **{dimension: analytics.summary(dimension) for dimension in DIMENSIONS}
+    ))
+
+@app.route('/analytics/top')
+def analytics_top():
+    metric, n = top_query()
+    return analytics_response(('top', metric, n), lambda: analytics.top_products(metric=metric, n=n))
+
+@app.route('/analytics/<dimension>')
+def analytics_dimension(dimension):
+    if dimension not in DIMENSIONS:
+        abort(404)
+    return analytics_response(('dimension', dimension), lambda: analytics.summary(dimension))
+
+@app.route('/analytics/<dimension>/<path:value>/top')
+def analytics_dimension_top(dimension, value):
+    if dimension not in DIMENSIONS:
+        abort(404)
+    metric, n = top_query()
+    return analytics_response(('top', dimension, value, metric, n), lambda: analytics.top_products(dimension, value, metric, n))
+
+@app.route('/interactions')
+def interactions():
+    # ?kiosk_id=&kind=&emotion=&product_id=&since=&until= (epoch seconds), newest first
+    args = request.args
+    limit = min(max(args.get('limit', 100, type=int), 1), 5000)
+    return jsonify(interaction_log.query(
+        since=args.get('since', type=float),
+        until=args.get('until', type=float),
+        limit=limit,
+        **{name: args.get(name) for name in QUERY_FILTERS}
+    ))
+
+@app.route('/metrics')
+def metrics():
+    return jsonify({
+        "subscriber": tracer.snapshot(),
+        "publisher": publisher_metrics,
+        "kiosks": kiosks.snapshot(),
+        "socketio": event_bus.metrics(),
+        "speech": speech_scheduler.metrics(),
+        "interactions": interaction_log.metrics(),
+    })
+
+def init_services(emitter=None, tts=True, watch_sales=True):
+    # Builds everything handle_mqtt_message relies on. bench_subscriber.py passes a stand-in emitter and no TTS.
+    global catalog, recommender, analytics, analytics_responses, speech_scheduler, event_bus, interaction_log
+    sales_df = datastore.load_sales(app.config['SALES_CSV_PATH'])
+    product_df = datastore.load_products(app.config['PRODUCT_CSV_PATH'])
+    thumbnails = load_thumbnails(os.path.join(app.config['THUMBNAIL_DIR'], 'manifest.json'), '/thumbnails')
+    catalog = ProductCatalog(product_df, sales_df, thumbnails)
+    recommender = EmotionRecommender(sales_df, thumbnails)
+    analytics = SalesAnalytics(sales_df)
+    analytics_responses = CachedResponses(analytics)
+    if watch_sales:
+        SalesFileWatcher(app.config['SALES_CSV_PATH'], [recommender, analytics]).start()
+    backends = [speech.create_backend(app.config['TTS_BACKEND']), speech.create_backend(app.config['TTS_FALLBACK_BACKEND'])]
+    phrase_cache = speech.PhraseCache(
+        app.config['TTS_CACHE_DIR'],
+        backends if tts else [],
+        max_entries=app.config['TTS_CACHE_MAX_ENTRIES']
+    )
+    if tts and app.config['TTS_WARM_UP']:
+        phrase_cache.start_warm_up(speech.all_phrases(catalog.item_index, catalog.brand_items))
+    speech_scheduler = speech.SpeechScheduler(
+        phrase_cache,
+        cooldown_period=app.config['TTS_COOLDOWN_PERIOD'],
+        max_queue=app.config['TTS_QUEUE_SIZE'],
+        max_age=app.config['TTS_MAX_AGE']
+    ).start()
+    interaction_log = InteractionLog(
+        app.config['INTERACTION_DB_PATH'],
+        retention_days=app.config['INTERACTION_RETENTION_DAYS']
+    ).start()
+    event_bus = EventBus(
+        emitter or socketio,
+        rate_limits=app.config['SOCKETIO_RATE_LIMITS'],
+        ack_timeout=app.config['SOCKETIO_ACK_TIMEOUT'],
+        tracer=tracer
+    ).start()
+
+def stop_services():
+    # Stops the worker threads init_services started; bench_subscriber.py calls it between runs
+    event_bus.stop()
+    speech_scheduler.stop()
+    interaction_log.stop()
+
+def start_mqtt():
+    mqtt.init_app(app)
     for topic in app.config['MQTT_TOPICS']:
         mqtt.subscribe(topic)
+
+if __name__ == '__main__':
+    init_services()
+    start_mqtt()
     socketio.run(app, host='0.0.0.0', port=5000)
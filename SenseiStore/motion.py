@@ -0,0 +1,83 @@
+import threading
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    # Cheap frame-difference check on a small blurred grayscale copy of the frame.
+    # The reference is the last frame a model actually ran on, so slow drift still adds up to motion.
+    def __init__(self, width=80, pixel_threshold=25, min_changed_fraction=0.01, refresh_interval=2.0,
+                 roi=False, roi_padding=0.15, max_roi_fraction=0.6):
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_fraction = min_changed_fraction
+        self.refresh_interval = refresh_interval
+        self.roi = roi
+        self.roi_padding = roi_padding
+        self.max_roi_fraction = max_roi_fraction
+        self.reference = None
+        self.last_pass = None
+        self.lock = threading.Lock()
+        self.checks = 0
+        self.hits = 0
+        self.inference_ms = None
+
+    def check(self, frame, now):
+        # Returns (run_model, roi). roi is (x1, y1, x2, y2) in frame pixels, or None for the full frame.
+        h, w = frame.shape[:2]
+        height = max(int(self.width * h / w), 1)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        small = cv2.GaussianBlur(cv2.resize(gray, (self.width, height), interpolation=cv2.INTER_AREA), (5, 5), 0)
+
+        with self.lock:
+            self.checks += 1
+            if self.reference is None or self.reference.shape != small.shape or now - self.last_pass >= self.refresh_interval:
+                return self._pass(small, now), None
+
+            changed = cv2.absdiff(small, self.reference) > self.pixel_threshold
+            if changed.mean() < self.min_changed_fraction:
+                self.hits += 1
+                return False, None
+            self._pass(small, now)
+
+        if not self.roi:
+            return True, None
+        ys, xs = np.nonzero(changed)
+        scale_x, scale_y = w / self.width, h / height
+        pad_x, pad_y = int(w * self.roi_padding), int(h * self.roi_padding)
+        x1 = max(int(xs.min() * scale_x) - pad_x, 0)
+        y1 = max(int(ys.min() * scale_y) - pad_y, 0)
+        x2 = min(int((xs.max() + 1) * scale_x) + pad_x, w)
+        y2 = min(int((ys.max() + 1) * scale_y) + pad_y, h)
+        if (x2 - x1) * (y2 - y1) > self.max_roi_fraction * w * h:
+            return True, None
+        return True, (x1, y1, x2, y2)
+
+    def _pass(self, small, now):
+        self.reference = small
+        self.last_pass = now
+        return True
+
+    def record_inference(self, duration_ms, frames):
+        per_frame = duration_ms / max(frames, 1)
+        with self.lock:
+            self.inference_ms = per_frame if self.inference_ms is None else 0.9 * self.inference_ms + 0.1 * per_frame
+
+    def snapshot(self):
+        with self.lock:
+            result = {
+                "checks": self.checks,
+                "hit_rate": round(self.hits / self.checks, 3) if self.checks else None,
+                "saved_ms": round(self.hits * (self.inference_ms or 0), 1),
+            }
+            self.checks = 0
+            self.hits = 0
+        return result
+
+
+def merge_roi_detections(previous, fresh, roi):
+    # A model run on the moving region only sees that region: detections from earlier frames that lie
+    # entirely outside it are still there (a face or a drink held still), the rest is replaced by fresh ones
+    x1, y1, x2, y2 = roi
+    kept = [d for d in previous if d[2] <= x1 or d[0] >= x2 or d[3] <= y1 or d[1] >= y2]
+    return kept + fresh
@@ -0,0 +1,176 @@
+import threading
+import time
+
+
+class LatestFrameBuffer:
+    # Single-slot buffer: the camera overwrites it, each stage blocks until a newer frame exists.
+    # Slow stages simply skip the frames they missed instead of queueing them up.
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.frame = None
+        self.sequence = 0
+        self.captured_at = None
+        self.closed = False
+
+    def put(self, frame, captured_at=None):
+        with self.condition:
+            self.frame = frame
+            self.sequence += 1
+            self.captured_at = captured_at if captured_at is not None else time.monotonic()
+            self.condition.notify_all()
+
+    def get(self, last_sequence, timeout=None):
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.sequence > last_sequence or self.closed, timeout):
+                return None
+            if self.closed:
+                return None
+            return self.sequence, self.frame, self.captured_at
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class StageStats:
+    # Rolling counters for one pipeline stage, reset every time a snapshot is taken
+    def __init__(self, name):
+        self.name = name
+        self.lock = threading.Lock()
+        self.reset_time = time.monotonic()
+        self.frames = 0
+        self.skipped = 0
+        self.busy_ms = 0.0
+        self.age_ms = 0.0
+
+    def record(self, started, finished, captured_at, skipped=0, frames=1):
+        with self.lock:
+            self.frames += frames
+            self.skipped += skipped
+            # One handler call covers the whole batch, so latency_ms = busy_ms / frames is per frame
+            self.busy_ms += (finished - started) * 1000
+            self.age_ms += (finished - captured_at) * 1000 * frames
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self.lock:
+            elapsed = max(now - self.reset_time, 1e-6)
+            frames = self.frames
+            result = {
+                "stage": self.name,
+                "frames": frames,
+                "fps": round(frames / elapsed, 2),
+                "latency_ms": round(self.busy_ms / frames, 1) if frames else None,
+                "frame_age_ms": round(self.age_ms / frames, 1) if frames else None,
+                "skipped": self.skipped,
+            }
+            self.reset_time = now
+            self.frames = 0
+            self.skipped = 0
+            self.busy_ms = 0.0
+            self.age_ms = 0.0
+        return result
+
+
+def next_batch(buffer, last_sequence, max_batch, max_wait, timeout):
+    # Block for the first frame, then keep taking newer frames until the batch is full or max_wait runs out
+    item = buffer.get(last_sequence, timeout=timeout)
+    if item is None:
+        return last_sequence, []
+    batch = [item]
+    deadline = time.monotonic() + max_wait
+    while len(batch) < max_batch:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        item = buffer.get(batch[-1][0], timeout=remaining)
+        if item is None:
+            break
+        batch.append(item)
+    return batch[-1][0], batch
+
+
+def run_stage(buffer, stats, handler, stop_event, max_batch=1, max_wait=0.0, timeout=1.0):
+    last_sequence = 0
+    while not stop_event.is_set():
+        previous_sequence = last_sequence
+        last_sequence, batch = next_batch(buffer, last_sequence, max_batch, max_wait, timeout)
+        if not batch:
+            continue
+        skipped = last_sequence - previous_sequence - len(batch) if previous_sequence else 0
+        started = time.monotonic()
+        try:
+            # The handler gets (sequence, frame, captured_at) tuples, oldest first
+            handler(batch)
+        except Exception as e:
+            print(f"⚠️ {stats.name} stage error:", e)
+        stats.record(started, time.monotonic(), batch[0][2], skipped, frames=len(batch))
+
+
+class CaptureSession:
+    # One opened frame source and the thread reading it into the frame buffer. The thread has its own stop
+    # event, so ending a session can never stop or race the next one. In standby the source stays open
+    # but is only read at standby_fps and nothing reaches the buffer, so the models idle while the camera
+    # keeps its stream and exposure settled; activate() makes frames flow within one frame time.
+    def __init__(self, source, frame_buffer, tracer=None, standby_fps=2.0, flush_frames=3):
+        self.source = source
+        self.frame_buffer = frame_buffer
+        self.tracer = tracer
+        self.standby_interval = 1 / standby_fps if standby_fps else 0
+        # Frames the driver queued during standby, dropped on activation so the first frame is current
+        self.flush_frames = flush_frames
+        self.active = threading.Event()
+        self.stop_event = threading.Event()
+        self.cap = None
+        self.thread = None
+        self.idle_since = None
+
+    def start(self, active=False):
+        self.cap = self.source.open()
+        if active:
+            self.active.set()
+        else:
+            self.idle_since = time.monotonic()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def activate(self):
+        self.idle_since = None
+        self.active.set()
+
+    def standby(self):
+        self.idle_since = time.monotonic()
+        self.active.clear()
+
+    def stop(self, timeout=2.0):
+        # The reader thread releases the source itself once it is out of read(), so a read that outlasts
+        # the timeout never sees a released capture; stop() just stops waiting for it
+        self.stop_event.set()
+        self.active.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            if self.thread.is_alive():
+                print("⚠️ Camera read still blocked, capture will be released when it returns")
+
+    def run(self):
+        cap = self.cap
+        try:
+            while not self.stop_event.is_set():
+                if not self.active.is_set():
+                    cap.grab()
+                    if self.active.wait(self.standby_interval) and not self.stop_event.is_set():
+                        for _ in range(self.flush_frames):
+                            cap.grab()
+                    continue
+                started = time.perf_counter()
+                ret, frame = cap.read()
+                if ret:
+                    if self.tracer is not None:
+                        self.tracer.observe_since("capture", started)
+                    self.frame_buffer.put(frame)
+                else:
+                    self.stop_event.wait(0.03)
+        finally:
+            cap.release()
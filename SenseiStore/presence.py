@@ -0,0 +1,52 @@
+import time
+
+AWAY = "away"
+ARRIVING = "arriving"
+PRESENT = "present"
+LEAVING = "leaving"
+
+
+class PresenceStateMachine:
+    # Turns ultrasonic distances into customer presence. Someone must come closer than enter_distance and
+    # stay for enter_dwell seconds to arrive, and move beyond exit_distance for exit_dwell seconds to leave.
+    # The gap between the two distances and the dwell times keep a passer-by, a single bad echo or someone
+    # swaying at the threshold from opening and closing sessions.
+    def __init__(self, enter_distance=80.0, exit_distance=100.0, enter_dwell=0.2, exit_dwell=2.0):
+        self.enter_distance = enter_distance
+        self.exit_distance = exit_distance
+        self.enter_dwell = enter_dwell
+        self.exit_dwell = exit_dwell
+        self.state = AWAY
+        self.since = None
+
+    @property
+    def present(self):
+        # ARRIVING is not present yet; LEAVING still is
+        return self.state in (PRESENT, LEAVING)
+
+    def update(self, distance, now=None):
+        # distance in cm, None when the sensor got no echo. Returns True when present changed.
+        now = time.monotonic() if now is None else now
+        near = distance is not None and distance < self.enter_distance
+        far = distance is None or distance > self.exit_distance
+
+        if self.state == AWAY:
+            if near:
+                self.state, self.since = ARRIVING, now
+        elif self.state == ARRIVING:
+            if not near:
+                self.state = AWAY
+        elif self.state == PRESENT:
+            if far:
+                self.state, self.since = LEAVING, now
+        elif self.state == LEAVING:
+            if not far:
+                self.state = PRESENT
+
+        if self.state == ARRIVING and now - self.since >= self.enter_dwell:
+            self.state = PRESENT
+            return True
+        if self.state == LEAVING and now - self.since >= self.exit_dwell:
+            self.state = AWAY
+            return True
+        return False
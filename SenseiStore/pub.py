@@ -1,202 +1,421 @@
-import RPi.GPIO as GPIO
+import os
 import time
 import cv2
 import json
 import base64
 import threading
-import queue
+import numpy as np
 from datetime import datetime
-from ultralytics import YOLO
 from deepface import DeepFace
 import paho.mqtt.client as mqtt
 from paho.mqtt.client import CallbackAPIVersion
-from gpiozero import DistanceSensor
+from frame_protocol import pack_frame
+from pipeline import CaptureSession, LatestFrameBuffer, StageStats, run_stage
+from tracking import PICKUP_STARTED, DrinkVoter, FaceTracker, face_thumbnail
+from inference import load_detector, EmotionBatcher
+from motion import MotionGate, merge_roi_detections
+from tracing import Tracer, wall_time
+from sources import CameraSource, UltrasonicSensor
+from kiosks import KINDS, kiosk_topic
+from stream_quality import StreamQualityController
+from presence import PresenceStateMachine
 
-class UltrasonicSensor:
-    def __init__(self, trig_pin, echo_pin):
-        self.sensor = DistanceSensor(echo=echo_pin, trigger=trig_pin, max_distance=2)
-        self.threshold_distance = 80
-
-    def measure_distance(self):
-        dist_cm = self.sensor.distance * 100
-        return round(dist_cm, 2)
+BROKER_HOST = os.environ.get("MQTT_BROKER_URL", "192.168.238.123")
+BROKER_PORT = int(os.environ.get("MQTT_BROKER_PORT", 1883))
+# Each Pi publishes under camera/<KIOSK_ID>/..., one subscriber can serve many kiosks
+KIOSK_ID = os.environ.get("KIOSK_ID", "default")
 
 class MultiDetector:
-    def __init__(self):
-        self.face_model = YOLO("model/yolov11n-face.pt")
-        self.drink_model = YOLO("my_model.pt")
-        self.client = mqtt.Client(callback_api_version=CallbackAPIVersion.VERSION2, client_id="Publisher")
-        self.client.connect("192.168.238.123", 1883)
-        self.client.loop_start()
-        self.mqtt_topic = ["camera/detection", "camera/videostreaming", "camera/softdrink"]
-        self.frame_queue = queue.Queue(maxsize=1)
-        self.running_flag = [True]
-        self.cap = None
+    def __init__(self, inference_runtime="pytorch", max_batch=1, max_batch_wait=0.05, batch_emotions=True,
+                 motion_gating=True, motion_roi=False, imgsz=256, frame_source=None, client=None, kiosk_id=KIOSK_ID,
+                 stream_quality=None, drink_votes=3, drink_window=5, drink_heartbeat=2.0, warm_up=True, standby=True,
+                 standby_fps=2.0, standby_timeout=600):
+        # inference_runtime: "pytorch", or "onnx" / "openvino" to export once and run on a CPU runtime
+        # frame_source: the webcam by default, see sources.py for video files, image folders and synthetic frames
+        # client: anything with paho's publish(); bench_publisher.py passes a byte counter instead of a broker
+        # stream_quality: a StreamQualityController, whose floors and ceilings bound the live stream
+        # drink_votes / drink_window: a drink must be seen in drink_votes of drink_window frames to count as picked up;
+        # drink_heartbeat: seconds between "holding" events while it is held, 0 for none
+        # warm_up: run every model once on a dummy input at boot, so no customer pays for the first inference
+        # standby: keep the camera open at standby_fps while nobody is there, closing it after standby_timeout s (None: never)
+        self.imgsz = imgsz
+        self.face_model = load_detector("model/yolov11n-face.pt", inference_runtime, imgsz)
+        self.drink_model = load_detector("my_model.pt", inference_runtime, imgsz)
+        self.emotion_batcher = EmotionBatcher() if batch_emotions else None
+        self.max_batch = max_batch
+        self.max_batch_wait = max_batch_wait
+        self.frame_source = frame_source or CameraSource()
+        self.client = client
+        if self.client is None:
+            self.client = mqtt.Client(callback_api_version=CallbackAPIVersion.VERSION2, client_id=f"Publisher-{kiosk_id}")
+            self.client.connect(BROKER_HOST, BROKER_PORT)
+            self.client.loop_start()
+        self.kiosk_id = kiosk_id
+        # detection, videostreaming, softdrink, metrics
+        self.mqtt_topic = [kiosk_topic(kiosk_id, kind) for kind in KINDS]
+        self.frame_buffer = LatestFrameBuffer()
+        self.stop_event = threading.Event()
+        self.stage_stats = []
+        self.stats_interval = 10
+        self.standby = standby
+        self.standby_fps = standby_fps
+        self.standby_timeout = standby_timeout
+        self.session = None
+        # Set when a customer arrives, cleared by the first emotion published for them
+        self.arrived_at = None
         self.min_confidence = 0.8
-        self.previous_face = None
-        self.previous_emotion = None
-        self.frame_counter = 0
-        self.frame_skip = 3
-        # self.detection_interval = 10
+        self.face_tracker = FaceTracker(eval_interval=2.0)
+        self.drink_voter = DrinkVoter(drink_votes, drink_window, drink_heartbeat)
+        self.deepface_calls = 0
+        # Latency histograms per stage, published on camera/<kiosk_id>/metrics with every stats report
+        self.tracer = Tracer()
+        self.stream_quality = stream_quality or StreamQualityController()
+        # Skip the detectors on static frames and reuse their last detections
+        self.motion_gates = {}
+        if motion_gating:
+            self.motion_gates = {"face": MotionGate(roi=motion_roi), "drink": MotionGate(roi=motion_roi)}
+        self.last_detections = {"face": [], "drink": []}
         self.custom_names = {
                 0: {"name": "Osulloc Samdayeon Honey Pear Tea", "id": "160"},
                 1: {"name": "Monster Energy Can Drink - Mango Loco", "id": "147"},
                 2: {"name": "Pokka Bottle Drink - Jasmine Green Tea", "id": "3"},
                 3: {"name": "Schwepps Tonic", "id": "159"}
             }
+        if warm_up:
+            self.warm_up()
+
+    def warm_up(self):
+        # The first call of each model builds its predictor and allocates its buffers, which can take seconds
+        started = time.perf_counter()
+        frame = np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8)
+        try:
+            for batch_size in sorted({1, self.max_batch}):
+                self.face_model([frame] * batch_size, imgsz=self.imgsz)
+                self.drink_model([frame] * batch_size, imgsz=self.imgsz)
+            self._analyze_emotions([np.zeros((64, 64, 3), dtype=np.uint8)])
+        except Exception as e:
+            print("⚠️ Model warm-up failed:", e)
+            return
+        print(f"🔥 Models warmed up in {self.tracer.observe_since('warm_up', started):.0f} ms")
+
+    def stream_stage(self, batch):
+        # 1. Publish live video stream, stamped with the frame sequence number and capture time.
+        # Resolution, JPEG quality and frame rate follow the stream quality controller.
+        for sequence, frame, captured_at in batch:
+            if not self.stream_quality.should_send(time.monotonic()):
+                continue
+            h, w = frame.shape[:2]
+            width, height = self.stream_quality.frame_size(w, h)
+            started = time.perf_counter()
+            if width != w:
+                frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+            success, encoded_image = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.stream_quality.point["quality"]])
+            encode_ms = self.tracer.observe_since("encode", started)
+            if success:
+                data = pack_frame(encoded_image.tobytes(), sequence, width, height, timestamp=wall_time(captured_at))
+                with self.tracer.span("publish"):
+                    info = self.client.publish(self.mqtt_topic[1], data)
+                self.stream_quality.record(encode_ms, info)
+
+    def publish_detection(self, topic, payload, sequence, captured_at, durations):
+        # Every detection carries the frame it came from and how long each stage took for it
+        payload["seq"] = sequence
+        payload["captured_at"] = wall_time(captured_at)
+        payload["stages_ms"] = durations
+        with self.tracer.span("publish"):
+            self.client.publish(topic, json.dumps(payload))
+        self.tracer.observe("capture_to_publish", (time.monotonic() - captured_at) * 1000)
+
+    def analyze_emotions(self, crops, durations=None):
+        self.deepface_calls += len(crops)
+        with self.tracer.span("deepface", durations):
+            return self._analyze_emotions(crops)
+
+    def _analyze_emotions(self, crops):
+        if self.emotion_batcher is not None:
+            return self.emotion_batcher.analyze(crops)
+
+        scores = []
+        for face_crop in crops:
+            try:
+                emotion_analysis = DeepFace.analyze(
+                    face_crop,
+                    actions=['emotion'],
+                    detector_backend='skip',
+                    enforce_detection=True,
+                )
+                scores.append(emotion_analysis[0]['emotion'])
+            except Exception as e:
+                print("⚠️ DeepFace Error:", e)
+                scores.append(None)
+        return scores
+
+    def detect(self, name, model, frames, durations=None):
+        # One batched model call for the frames that moved (optionally cropped to the moving region).
+        # Static frames reuse the last detections. Returns (x1, y1, x2, y2, conf, cls) tuples per frame.
+        gate = self.motion_gates.get(name)
+        now = time.monotonic()
+        inputs = []
+        rois = []
+        plan = []
+        for frame in frames:
+            run_model, roi = gate.check(frame, now) if gate is not None else (True, None)
+            if run_model:
+                if roi is not None:
+                    x1, y1, x2, y2 = roi
+                    inputs.append(frame[y1:y2, x1:x2])
+                else:
+                    inputs.append(frame)
+                rois.append(roi)
+            plan.append(run_model)
+
+        results = []
+        if inputs:
+            started = time.perf_counter()
+            results = model(inputs, imgsz=self.imgsz)
+            inference_ms = self.tracer.observe_since(f"{name}_yolo", started)
+            if durations is not None:
+                durations[f"{name}_yolo"] = round(inference_ms, 2)
+            if gate is not None:
+                gate.record_inference(inference_ms, len(inputs))
+
+        detections = []
+        fresh = iter(zip(results, rois))
+        for run_model in plan:
+            if run_model:
+                result, roi = next(fresh)
+                ox, oy = roi[:2] if roi is not None else (0, 0)
+                boxes = result.boxes
+                found = [
+                    (int(x1) + ox, int(y1) + oy, int(x2) + ox, int(y2) + oy, conf, int(cls))
+                    for (x1, y1, x2, y2), conf, cls in zip(boxes.xyxy.tolist(), boxes.conf.tolist(), boxes.cls.tolist())
+                ]
+                if roi is not None:
+                    # Objects outside the moving region were not looked at, so they keep their last boxes
+                    found = merge_roi_detections(self.last_detections[name], found, roi)
+                self.last_detections[name] = found
+            detections.append(self.last_detections[name])
+        return detections
+
+    def face_stage(self, batch):
+        # 2. Face detection & emotion, one face YOLO call for the whole frame group
+        durations = {}
+        results = self.detect("face", self.face_model, [frame for _, frame, _ in batch], durations)
+        now = time.monotonic()
+
+        detections = []
+        pending = {}
+        for (sequence, frame, captured_at), result in zip(batch, results):
+            boxes = []
+            confidences = []
+            for x1, y1, x2, y2, conf, _ in result:
+                conf = round(conf, 2)
+                if conf < self.min_confidence:
+                    continue
+                boxes.append((x1, y1, x2, y2))
+                confidences.append(conf)
+
+            tracks = self.face_tracker.update(boxes, now)
+            for track, conf in zip(tracks, confidences):
+                x1, y1, x2, y2 = track.box
+                margin = 30
+                h, w, _ = frame.shape
+                x1m = max(x1 - margin, 0)
+                y1m = max(y1 - margin, 0)
+                x2m = min(x2 + margin, w)
+                y2m = min(y2 + margin, h)
+                face_crop = frame[y1m:y2m, x1m:x2m]
+                thumbnail = face_thumbnail(face_crop)
+
+                # Re-run DeepFace only for new faces, on the refresh interval, or after a big change in the crop.
+                # Within a frame group the newest crop of each track wins.
+                if self.face_tracker.needs_evaluation(track, thumbnail, now):
+                    pending[track.track_id] = (track, face_crop, thumbnail)
+                detections.append((track, face_crop, conf, sequence, captured_at))
+
+        if pending:
+            entries = list(pending.values())
+            try:
+                scores = self.analyze_emotions([face_crop for _, face_crop, _ in entries], durations)
+                for (track, _, thumbnail), emotion_scores in zip(entries, scores):
+                    if emotion_scores is not None:
+                        self.face_tracker.apply_emotion(track, emotion_scores, thumbnail, now)
+            except Exception as e:
+                print("⚠️ DeepFace Error:", e)
+
+        for track, face_crop, conf, sequence, captured_at in detections:
+            if track.emotion is None:
+                continue
+            with self.tracer.span("encode"):
+                success, encoded_face = cv2.imencode('.jpg', face_crop)
+            if not success:
+                continue
+            face_b64 = base64.b64encode(encoded_face).decode('utf-8')
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+            payload = {
+                "timestamp": timestamp,
+                "emotion": track.emotion,
+                "track_id": track.track_id,
+                "image_b64": face_b64,
+                "confidence_score": conf
+            }
+            self.publish_detection(self.mqtt_topic[0], payload, sequence, captured_at, durations)
+            arrived_at = self.arrived_at
+            if arrived_at is not None:
+                self.arrived_at = None
+                self.tracer.observe("arrival_to_emotion", (time.monotonic() - arrived_at) * 1000)
+
+    def drink_stage(self, batch):
+        # 3. Softdrink detection, one drink YOLO call for the whole frame group.
+        # Frames vote per class; only pickups, heartbeats and put-downs are published, not every frame.
+        durations = {}
+        drink_results = self.detect("drink", self.drink_model, [frame for _, frame, _ in batch], durations)
+
+        for (sequence, frame, captured_at), result in zip(batch, drink_results):
+            seen = {}
+            for x1, y1, x2, y2, conf, cls_id in result:
+                conf = round(conf, 2)
+                if conf < 0.8:
+                    continue
+                if cls_id not in seen or conf > seen[cls_id][0]:
+                    seen[cls_id] = (conf, (x1, y1, x2, y2))
+
+            now = time.monotonic()
+            for event, track in self.drink_voter.update(seen, frame, now):
+                self.publish_drink_event(event, track, now, sequence, captured_at, durations)
 
-    def camera_capture_thread(self, cap):
-        while self.running_flag[0]:
-            ret, frame = cap.read()
-            if ret and not self.frame_queue.full():
-                self.frame_queue.put(frame)
-            time.sleep(0.03)
+    def release_drinks(self, events):
+        # Put-downs found without a frame (timeout or departure), stamped with the drink's last sighting
+        now = time.monotonic()
+        for event, track in events:
+            self.publish_drink_event(event, track, now, None, track.last_seen, {})
+
+    def publish_drink_event(self, event, track, now, sequence, captured_at, durations):
+        class_info = self.custom_names.get(track.cls_id, {"name": f"Unknown-{track.cls_id}", "id": str(track.cls_id)})
+        product_name = class_info["name"]
+        payload = {
+            "event": event,
+            "timestamp": datetime.now().strftime("%Y%m%d_%H%M%S"),
+            "product_id": class_info["id"],
+            "product_name": product_name,
+            "confidence_score": track.confidence,
+            "held_s": round(now - track.started, 1),
+        }
+        if event == PICKUP_STARTED:
+            # The single crop of the pickup: its most confident sighting
+            best_frame, (x1, y1, x2, y2) = track.best
+            track.best = None
+            with self.tracer.span("encode"):
+                success, encoded_drink = cv2.imencode('.jpg', best_frame[y1:y2, x1:x2])
+            if success:
+                payload["image_b64"] = base64.b64encode(encoded_drink).decode('utf-8')
+        if sequence is None:
+            payload["captured_at"] = wall_time(captured_at)
+            with self.tracer.span("publish"):
+                self.client.publish(self.mqtt_topic[2], json.dumps(payload))
+        else:
+            self.publish_detection(self.mqtt_topic[2], payload, sequence, captured_at, durations)
+        print(f"🥤 Softdrink {event}: {product_name} ({track.confidence})")
 
     def processing_thread(self):
-        while True:
-            if not self.frame_queue.empty():
-                frame = self.frame_queue.get()  
-                self.frame_counter += 1
-                # 1. Publish live video stream
-                try:
-                    success, encoded_image = cv2.imencode('.jpg', frame)
-                    if success:
-                        image_b64 = base64.b64encode(encoded_image).decode('utf-8')
-                        image_payload = {
-                            "timestamp": datetime.now().strftime("%Y%m%d_%H%M%S"),
-                            "image_b64": image_b64
-                        }
-                        self.client.publish(self.mqtt_topic[1], json.dumps(image_payload))
-                except Exception as e:
-                    print("❌ Failed to publish image stream:", e)
-
-                # if self.frame_counter % self.frame_skip != 0:
-                #     continue
-                # 2. Face detection & emotion
-                
-                results = self.face_model(frame, imgsz=256)
-                # face_found = False
-
-                for result in results:
-                    for box in result.boxes:
-                        conf = round(box.conf[0].item(), 2)
-                        if conf < self.min_confidence:
-                            continue
-
-                        x1, y1, x2, y2 = map(int, box.xyxy[0])
-                        margin = 30
-                        h, w, _ = frame.shape
-                        x1m = max(x1 - margin, 0)
-                        y1m = max(y1 - margin, 0)
-                        x2m = min(x2 + margin, w)
-                        y2m = min(y2 + margin, h)
-                        face_crop = frame[y1m:y2m, x1m:x2m]
-                        # crop_height, crop_width = face_crop.shape[:2]
-                        # print(f"🖼️ Face Crop Size: width = {crop_width}, height = {crop_height}")       
-
-                        try:
-                            # start_time = time.time()
-                            emotion_analysis = DeepFace.analyze(
-                                face_crop,
-                                actions=['emotion'],
-                                detector_backend='skip',
-                                enforce_detection=True,
-                            )
-                            # end_time = time.time()
-                            # deepface_duration = round((end_time - start_time) * 1000, 2)
-                            # print(f"🧠 DeepFace analysis took {deepface_duration} ms")
-
-                            emotion = emotion_analysis[0]['dominant_emotion']
-                            success, encoded_face = cv2.imencode('.jpg', face_crop)
-                            if not success:
-                                continue
-                            face_b64 = base64.b64encode(encoded_face).decode('utf-8')
-                            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-
-                            payload = {
-                                "timestamp": timestamp,
-                                "emotion": emotion,
-                                "image_b64": face_b64,
-                                "confidence_score": conf
-                            }
-                            self.client.publish(self.mqtt_topic[0], json.dumps(payload))
-                            # print(f"📤 Emotion published: {list(payload.keys())}")
-                            # face_found = True
-
-                        except Exception as e:
-                            print("⚠️ DeepFace Error:", e)
-
-                # 3. Softdrink detection (only if face was detected)
-                # if face_found:
-                # if softdrink_counter < self.detection_interval:
-                    # continue  # skip softdrink detection this round
-                # softdrink_counter = 0  # reset after triggering
-
-                try:
-                    drink_results = self.drink_model(frame,imgsz=256)
-
-                    for result in drink_results:
-                        for box in result.boxes:
-
-                            conf = round(box.conf[0].item(), 2)
-                            if conf < 0.8:
-                                continue
-                            cls_id = int(box.cls[0])
-                            class_info = self.custom_names.get(cls_id, {"name": f"Unknown-{cls_id}", "id": str(cls_id)})
-                            product_name = class_info["name"]
-                            product_id = class_info["id"]
-
-                            # print("class_name",class_name)
-                            x1, y1, x2, y2 = map(int, box.xyxy[0])
-                            drink_crop = frame[int(y1):int(y2), int(x1):int(x2)]
-                            success, encoded_drink = cv2.imencode('.jpg', drink_crop)
-                            if not success:
-                                continue
-                            drink_b64 = base64.b64encode(encoded_drink).decode('utf-8')
-
-                            payload = {
-                                "timestamp": datetime.now().strftime("%Y%m%d_%H%M%S"),
-                                "product_id": product_id,
-                                "product_name": product_name,
-                                "confidence_score": conf,
-                                "image_b64": drink_b64
-                            }
-                            self.client.publish(self.mqtt_topic[2], json.dumps(payload))
-                            print(f"🥤 Softdrink published: {product_name} ({conf})")
-                except Exception as e:
-                    print("⚠️ Softdrink Error:", e)
-
-    def run(self, sensor, threshold_distance):
+        # Each stage samples the newest frames at its own pace, so streaming is never held up by the models.
+        # Model stages may take up to max_batch frames per call, waiting at most max_batch_wait for them.
+        stages = [
+            ("stream", self.stream_stage, 1, 0.0),
+            ("face", self.face_stage, self.max_batch, self.max_batch_wait),
+            ("drink", self.drink_stage, self.max_batch, self.max_batch_wait),
+        ]
+        for name, handler, max_batch, max_wait in stages:
+            stats = StageStats(name)
+            self.stage_stats.append(stats)
+            threading.Thread(
+                target=run_stage,
+                args=(self.frame_buffer, stats, handler, self.stop_event, max_batch, max_wait),
+                daemon=True
+            ).start()
+
+        while not self.stop_event.wait(self.stats_interval):
+            report = [stats.snapshot() for stats in self.stage_stats]
+            deepface_calls = self.deepface_calls
+            deepface_rate = round(deepface_calls / self.stats_interval, 2)
+            self.deepface_calls = 0
+            gates = {name: gate.snapshot() for name, gate in self.motion_gates.items()}
+            drinks = self.drink_voter.snapshot()
+            stream = self.stream_quality.operating_point()
+            print("📊 " + " | ".join(
+                f"{r['stage']}: {r['fps']} fps, {r['latency_ms']} ms/frame, skipped {r['skipped']}" for r in report
+            ) + f" | deepface: {deepface_rate} calls/s" + "".join(
+                f" | {name} gate: {g['hit_rate']} hit rate, {g['saved_ms']} ms saved" for name, g in gates.items()
+            ) + f" | stream: {stream['width']}px q{stream['quality']} @ {stream['fps']} fps (level {stream['level']})")
+            self.client.publish(self.mqtt_topic[3], json.dumps({
+                "timestamp": time.time(),
+                "stages": report,
+                "deepface_calls": deepface_calls,
+                "deepface_calls_per_s": deepface_rate,
+                "gates": gates,
+                "stream": stream,
+                "drinks": drinks,
+                "latency": self.tracer.snapshot(),
+            }))
+
+    def on_arrival(self):
+        self.arrived_at = time.monotonic()
+        if self.session is None:
+            print("Person detected. Opening camera...")
+            self.session = CaptureSession(self.frame_source, self.frame_buffer, self.tracer, self.standby_fps).start(active=True)
+        else:
+            print("Person detected. Waking camera...")
+            self.session.activate()
+
+    def on_departure(self):
+        self.arrived_at = None
+        if self.session is not None:
+            if self.standby:
+                print("No person. Camera on standby...")
+                self.session.standby()
+            else:
+                print("No person. Releasing camera...")
+                self.close_session()
+        # Nothing of this customer carries over to the next: their drinks are put down and the
+        # detections reused for static frames are forgotten
+        self.release_drinks(self.drink_voter.flush())
+        self.last_detections = {"face": [], "drink": []}
+
+    def close_session(self):
+        if self.session is not None:
+            self.session.stop()
+            self.session = None
+
+    def run(self, sensor, threshold_distance, presence=None, poll_interval=0.1):
+        # presence: a PresenceStateMachine; by default customers arrive within threshold_distance
+        # and leave beyond threshold_distance + 20 cm
+        presence = presence or PresenceStateMachine(threshold_distance, threshold_distance + 20)
         try:
             threading.Thread(target=self.processing_thread, daemon=True).start()
-            while True:
+            if self.standby:
+                self.session = CaptureSession(self.frame_source, self.frame_buffer, self.tracer, self.standby_fps).start()
+            while not self.stop_event.is_set():
                 dist = sensor.measure_distance()
-                print(f"Distance: {dist} cm")
-
-                if dist is not None and dist < threshold_distance:
-                    if self.cap is None:
-                        print("Person detected. Opening camera...")
-                        self.cap = cv2.VideoCapture(0)
-                        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-                        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-                        self.cap.set(cv2.CAP_PROP_FPS, 30)
-                        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 3)  
-                        threading.Thread(target=self.camera_capture_thread, args=(self.cap,), daemon=True).start()
-                else:
-                    if self.cap is not None:
-                        print("No person. Releasing camera...")
-                        self.running_flag[0] = False
-                        self.cap.release()
-                        self.cap = None
-                        self.running_flag[0] = True
-                time.sleep(0.2)
+                if presence.update(dist):
+                    print(f"Distance: {dist} cm")
+                    if presence.present:
+                        self.on_arrival()
+                    else:
+                        self.on_departure()
+                self.release_drinks(self.drink_voter.expire(time.monotonic()))
+                if (self.standby_timeout and self.session is not None and self.session.idle_since is not None
+                    and time.monotonic() - self.session.idle_since > self.standby_timeout):
+                    print("Nobody for a while. Releasing camera...")
+                    self.close_session()
+                self.stop_event.wait(poll_interval)
 
         except KeyboardInterrupt:
             print("Interrupted by user.")
         finally:
-            self.running_flag[0] = False
-            if self.cap is not None:
-                self.cap.release()
+            self.stop_event.set()
+            self.close_session()
+            self.frame_buffer.close()
             self.client.loop_stop()
             self.client.disconnect()
             print("Exiting gracefully...")
@@ -0,0 +1,112 @@
+import threading
+import numpy as np
+
+from catalog import RECOMMENDATION_FIELDS, thumbnail_for
+
+PRICE_BANDS = ["low", "mid", "high"]
+
+# How much each emotion cares about popularity and which product traits it favours
+EMOTION_PROFILES = {
+    "happy":    {"popularity": 0.6, "price_band": {"high": 0.3, "mid": 0.1}},
+    "sad":      {"popularity": 0.5, "category": {"Tea": 0.4}, "price_band": {"mid": 0.2}},
+    "angry":    {"popularity": 0.5, "category": {"Drinks": 0.2}, "price_band": {"low": 0.3}},
+    "surprise": {"popularity": -0.4, "price_band": {"high": 0.2, "mid": 0.2}},
+    "disgust":  {"popularity": 0.2, "price_band": {"low": 0.3, "mid": 0.1}},
+    "fear":     {"popularity": 1.0, "dietary": {"Halal": 0.3}},
+    "neutral":  {"popularity": 0.7, "price_band": {"mid": 0.2}},
+}
+DEFAULT_EMOTION = "neutral"
+
+
+class EmotionRecommender:
+    # Keeps running per-product sales aggregates and a ranked top-N array per emotion.
+    # Rankings are swapped in whole, so recommend() never sees a half-built list.
+    def __init__(self, sales_df, thumbnails=None, top_n=20, temperature=0.15, seed=None):
+        self.thumbnails = thumbnails or {}
+        self.top_n = top_n
+        self.temperature = temperature
+        self.rng = np.random.default_rng(seed)
+        self.lock = threading.Lock()
+        self.rebuild(sales_df)
+
+    def rebuild(self, sales_df):
+        with self.lock:
+            self.items = []
+            self.item_index = {}
+            self.categories = []
+            self.dietary = []
+            self.quantity = np.zeros(0)
+            self.price_sum = np.zeros(0)
+            self.price_count = np.zeros(0)
+            self._add_orders(sales_df)
+            self._rank()
+
+    def update(self, new_sales_df):
+        if new_sales_df.empty:
+            return
+        with self.lock:
+            self._add_orders(new_sales_df)
+            self._rank()
+        print(f"🔄 Emotion rankings refreshed with {len(new_sales_df)} new orders")
+
+    def recommend(self, emotion, n=6):
+        items, weights = self.rankings.get(emotion, self.rankings[DEFAULT_EMOTION])
+        if not items:
+            return []
+        picks = self.rng.choice(len(items), size=min(n, len(items)), replace=False, p=weights)
+        return [items[i] for i in picks]
+
+    def _add_orders(self, sales_df):
+        grouped = sales_df.groupby('Product', sort=False, observed=True).agg(
+            quantity=('Quantity', 'sum'),
+            price_sum=('Unit_Price', 'sum'),
+            price_count=('Unit_Price', 'count'),
+        )
+        new_products = grouped.index[~grouped.index.isin(list(self.item_index))]
+        if len(new_products):
+            first_rows = sales_df.drop_duplicates('Product').set_index('Product').loc[new_products]
+            for product, row in first_rows.iterrows():
+                self.item_index[product] = len(self.items)
+                self.items.append({
+                    'Product': product,
+                    'Product_Image_Url': row['Product_Image_Url'],
+                    'Product_Thumbnail_Url': thumbnail_for(self.thumbnails, product, row['Product_Bottle_Type']),
+                    'Unit_Price': float(row['Unit_Price']),
+                })
+                self.categories.append(row['Category'])
+                self.dietary.append(row['Product_Dietary_Attribute'])
+            grow = len(self.items) - len(self.quantity)
+            self.quantity = np.concatenate([self.quantity, np.zeros(grow)])
+            self.price_sum = np.concatenate([self.price_sum, np.zeros(grow)])
+            self.price_count = np.concatenate([self.price_count, np.zeros(grow)])
+
+        idx = np.array([self.item_index[product] for product in grouped.index], dtype=np.intp)
+        self.quantity[idx] += grouped['quantity'].to_numpy()
+        self.price_sum[idx] += grouped['price_sum'].to_numpy()
+        self.price_count[idx] += grouped['price_count'].to_numpy()
+
+    def _rank(self):
+        popularity = np.log1p(self.quantity)
+        if popularity.max() > 0:
+            popularity = popularity / popularity.max()
+        mean_price = self.price_sum / np.maximum(self.price_count, 1)
+        band_edges = np.quantile(mean_price, [1 / 3, 2 / 3])
+        price_band = np.array(PRICE_BANDS)[np.searchsorted(band_edges, mean_price, side='right')]
+        categories = np.array(self.categories, dtype=object)
+        dietary = np.array(self.dietary, dtype=object)
+
+        rankings = {}
+        for emotion, profile in EMOTION_PROFILES.items():
+            score = profile.get("popularity", 0) * popularity
+            for value, bonus in profile.get("category", {}).items():
+                score = score + bonus * (categories == value)
+            for value, bonus in profile.get("dietary", {}).items():
+                score = score + bonus * (dietary == value)
+            for value, bonus in profile.get("price_band", {}).items():
+                score = score + bonus * (price_band == value)
+
+            top = np.argsort(-score, kind='stable')[:self.top_n]
+            weights = np.exp((score[top] - score[top].max()) / self.temperature)
+            items = [{field: self.items[i][field] for field in RECOMMENDATION_FIELDS} for i in top]
+            rankings[emotion] = (items, weights / weights.sum())
+        self.rankings = rankings
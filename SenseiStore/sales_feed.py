@@ -0,0 +1,84 @@
+import io
+import os
+import threading
+import time
+import pandas as pd
+
+
+class SalesFileWatcher:
+    # Polls the sales CSV and hands only newly appended rows to each listener's update().
+    # If the file was rewritten instead of appended to, listeners get the full frame via rebuild().
+    # A rewrite is a new inode, a shrink, or a change in the bytes already read: the start of the file
+    # or the bytes just before the last offset. Same-size rewrites are caught through the mtime.
+    def __init__(self, path, listeners, poll_interval=5, check_bytes=4096):
+        self.path = path
+        self.listeners = listeners
+        self.poll_interval = poll_interval
+        self.check_bytes = check_bytes
+        with open(path, 'rb') as f:
+            self.header = f.readline()
+            f.seek(0, os.SEEK_END)
+            self.offset = f.tell()
+            self.remember(f, os.fstat(f.fileno()))
+
+    def remember(self, f, stat):
+        self.inode = stat.st_ino
+        self.mtime = stat.st_mtime_ns
+        self.prefix, self.boundary = self.read_checks(f, self.offset)
+
+    def read_checks(self, f, offset):
+        # (first bytes of the file, bytes just before offset), both within what has been read already
+        f.seek(0)
+        prefix = f.read(min(self.check_bytes, offset))
+        start = max(offset - self.check_bytes, 0)
+        f.seek(start)
+        return prefix, f.read(offset - start)
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+        return self
+
+    def run(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.poll()
+            except Exception as e:
+                print("❌ Failed to read new sales rows:", e)
+
+    def poll(self):
+        with open(self.path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            size = stat.st_size
+            if size == self.offset and stat.st_mtime_ns == self.mtime and stat.st_ino == self.inode:
+                return
+            rewritten = (
+                stat.st_ino != self.inode
+                or size < self.offset
+                or self.read_checks(f, self.offset) != (self.prefix, self.boundary)
+            )
+            if rewritten:
+                f.seek(0)
+                data = f.read(size)
+                self.header = data[:data.find(b'\n') + 1]
+                self.offset = size
+                self.remember(f, stat)
+                sales_df = pd.read_csv(io.BytesIO(data), encoding="utf-8")
+                for listener in self.listeners:
+                    listener.rebuild(sales_df)
+                return
+            if size == self.offset:
+                self.mtime = stat.st_mtime_ns
+                return
+
+            f.seek(self.offset)
+            chunk = f.read(size - self.offset)
+            # Leave a partially written last line for the next poll
+            end = chunk.rfind(b'\n') + 1
+            if end == 0:
+                return
+            self.offset += end
+            self.remember(f, stat)
+        new_rows = pd.read_csv(io.BytesIO(self.header + chunk[:end]), encoding="utf-8")
+        for listener in self.listeners:
+            listener.update(new_rows)
@@ -1,13 +1,15 @@
-import time
+import argparse
 import csv
+import hashlib
+import json
 import requests
 import pandas as pd
 import os
+from concurrent.futures import ThreadPoolExecutor
 from fake_useragent import UserAgent
-import random 
-import datetime
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-from urllib.parse import urlsplit, unquote
 # Selenium Modules
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
@@ -15,160 +17,323 @@ from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import NoSuchElementException,TimeoutException,ElementNotInteractableException
-from selenium.webdriver.common.keys import Keys
 
 current_directory = os.getcwd()
 image_folder = os.path.join(current_directory, "images")
 os.makedirs(image_folder, exist_ok=True)
+drinks_content_csv_path = os.path.join(current_directory, "drinks_content.csv")
+state_path = os.path.join(current_directory, "scrape_state.json")
 
-def driver_setup():
+CSV_COLUMNS = ['product_id', 'product_name', 'product_company',
+               'product_original_price', 'product_discounted_price', 'product_image',
+               'product_image_path','product_category',
+               'product_bottle_type',"product_dietary_attribute"]
+
+# One entry per brand page; product_company must match the name already used in the CSVs
+BRANDS = [
+    {
+        "product_company": "Monster",
+        "product_category": "Drinks",
+        "url": "https://www.fairprice.com.sg/brand/monster",
+    },
+    {
+        "product_company": "F & N ",
+        "product_category": "Drinks",
+        "url": "https://www.fairprice.com.sg/brand/f--n",
+    },
+    {
+        "product_company": "Pokka",
+        "product_category": "Drinks",
+        "url": "https://www.fairprice.com.sg/brand/pokka",
+    },
+]
+
+DOWNLOAD_WORKERS = 8
+BROWSER_WORKERS = 3
+CARD_XPATH = ".//div[contains(@class,'sc-e68f503d-0 kxZjUB product-container')]"
+
+def driver_setup(headless=True):
     options = Options()
     ua = UserAgent()
     user_agent = ua.random
     options.add_argument(f'user-agent={user_agent}')
     options.add_argument('window-size=1920,1080')
     options.add_argument("--disable-gpu")  # Fixes GPU rendering issues
-    # options.add_experimental_option("detach", True)
     # Don't show browser when scraping , will be faster
-    # options.add_argument("--headless")
+    if headless:
+        options.add_argument("--headless=new")
     driver =  webdriver.Chrome(options=options)
 
     return driver
 
+def brand_slug(brand):
+    return "".join(c if c.isalnum() else "_" for c in brand["product_company"].strip().lower())
+
+def session_setup(pool_size=DOWNLOAD_WORKERS):
+    # One pooled keep-alive session shared by all download workers
+    session = requests.Session()
+    retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["User-Agent"] = UserAgent().random
+    return session
+
 def file_exists_check():
-    drinks_content_csv_path = current_directory + "/drinks_content.csv"
     if os.path.isfile(drinks_content_csv_path):
         print("File Indeed Exists")
     else:
         # Creating an empty DataFrame without specifying data types
-        df = pd.DataFrame(columns=['product_id', 'product_name', 'product_company',
-                                   'product_original_price', 'product_discounted_price', 'product_image', 
-                                   'product_image_path','product_category', 
-                                   'product_bottle_type',"product_dietary_attribute"])
-        df.to_csv("drinks_content.csv", index=False, encoding="utf-8-sig")
+        df = pd.DataFrame(columns=CSV_COLUMNS)
+        df.to_csv(drinks_content_csv_path, index=False, encoding="utf-8-sig")
         # encoding="utf-8-sig" , this forces excel to read as utf-8 , solve the problem for the encoding because now the windows system read as cp-1252
         return "File Does Not Exists , So File Creation Completed"
 
-def download_image(image_url, folder_path,file_name):
+def product_key(product):
+    return f"{product['product_company'].strip()}|{product['product_name']}|{product['product_bottle_type']}"
+
+def product_fingerprint(product):
+    fields = [str(product[column]) for column in CSV_COLUMNS if column not in ('product_id', 'product_image_path')]
+    return hashlib.sha1("\x1f".join(fields).encode("utf-8")).hexdigest()
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(65536), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_state():
+    # Remembers product ids, row fingerprints and image ETags/hashes between runs
+    if os.path.isfile(state_path):
+        with open(state_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    # First run: adopt the ids already in drinks_content.csv so they stay stable
+    state = {"next_product_id": 1, "products": {}, "images": {}}
+    if os.path.isfile(drinks_content_csv_path):
+        existing = pd.read_csv(drinks_content_csv_path, encoding="utf-8-sig", dtype=str, keep_default_na=False)
+        for row in existing.to_dict(orient='records'):
+            state["products"][product_key(row)] = {"product_id": int(row['product_id']), "fingerprint": product_fingerprint(row)}
+        if len(existing):
+            state["next_product_id"] = int(existing['product_id'].astype(int).max()) + 1
+    return state
+
+def save_state(state):
+    with open(state_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=1)
+    os.replace(state_path + ".tmp", state_path)
+
+def download_image(session, image_url, folder_path, file_name, known):
+    # known: the state entry for this URL from a previous run ({"etag", "sha256"}) or None
+    local_path = os.path.join(folder_path, file_name)
+    headers = {}
+    if known and os.path.isfile(local_path) and file_sha256(local_path) == known.get("sha256"):
+        if not known.get("etag"):
+            return os.path.abspath(local_path), known
+        headers["If-None-Match"] = known["etag"]
     try:
-        response = requests.get(image_url, timeout=10)
-        local_path = os.path.join(folder_path, file_name)
+        response = session.get(image_url, timeout=10, headers=headers)
+        if response.status_code == 304:
+            return os.path.abspath(local_path), known
+        response.raise_for_status()
 
-        with open(local_path, 'wb') as f:
+        with open(local_path + ".part", 'wb') as f:
             f.write(response.content)
+        os.replace(local_path + ".part", local_path)
 
-        return os.path.abspath(local_path)
+        entry = {"etag": response.headers.get("ETag"), "sha256": hashlib.sha256(response.content).hexdigest()}
+        return os.path.abspath(local_path), entry
     except Exception as e:
         print(f"Failed to download {image_url}: {e}")
-        return ""
-    
-def get_beverages_contents(driver):
-    # https://www.fairprice.com.sg/brand/f--n
-    base_url = "https://www.fairprice.com.sg/brand/monster?srsltid=AfmBOoqFsp7kfje54lwWCpfMBxK5ofFwB5yFTCL_mv3i8IE2uy4JEEtA"
-    driver.get(base_url)
-
-    product_id = 143
-    # product_name = ""
-    product_company = "Monster"
-    # product_original_price = ""
-    # product_discounted_price = ""
-    # product_image = ""
-    # product_image_path = ""
-    product_category = "Drinks"
-    # product_bottle_type = ""
-    # product_dietary_attribute = ""
-
-   
+        return "", known
+
+def parse_card(card, brand):
+    product_original_price = ""
+    product_discounted_price = 0
+    product_dietary_attribute = ""
+
+    product_info_container = card.find_element(By.XPATH,".//div[contains(@class,'sc-e68f503d-32 jvFTSZ')]//div[contains(@class,'sc-e68f503d-8 kRpkxd')]")
+    product_price_container = product_info_container.find_elements(By.XPATH,".//div[contains(@class,'sc-e68f503d-11 iYFArc')]//div[contains(@class,'sc-e68f503d-10 dksglq')]")[0]
+    product_prices = product_price_container.find_elements(By.TAG_NAME, "span")
+    try:
+        product_original_price = product_prices[0].get_attribute("innerText")
+    except (NoSuchElementException, IndexError):
+        print("No product_original_price")
     try:
-        drink_section = driver.find_element(By.XPATH,"//div[contains(@class,'sc-84b21786-6 iTtMbI')]")
-    except NoSuchElementException:
-        print("No Drink Objects")
+        product_discounted_price = product_prices[2].get_attribute("innerText")
+    except (NoSuchElementException, IndexError):
+        print("No product_discounted_price")
+    product_name_container = product_info_container.find_elements(By.XPATH,".//div[contains(@class,'sc-e68f503d-7 cEAugL')]//div[contains(@class,'sc-408392be-0 capxft')]")[0]
+    product_names = product_name_container.find_elements(By.TAG_NAME, "span")
 
-    last_height = driver.execute_script("return document.body.scrollHeight")
+    product_name = product_names[1].get_attribute("innerText")
+
+    product_quantity_halal_or_not_container = product_info_container.find_elements(By.XPATH,".//div[contains(@class,'sc-e68f503d-7 cEAugL')]//div[contains(@class,'sc-e68f503d-31 jaFXRP')]//div[contains(@class,'sc-e94e62e6-1 daFmNg')]")[0]
+    product_quantity_halal_or_not = product_quantity_halal_or_not_container.find_elements(By.TAG_NAME, "span")
+
+    product_bottle_type = product_quantity_halal_or_not[0].get_attribute("innerText")
+    try:
+        product_dietary_attribute = product_quantity_halal_or_not[1].get_attribute("innerText")
+    except (NoSuchElementException, IndexError):
+        pass
+    image_xpath = ".//div[contains(@class,'sc-e68f503d-4 jdonid')]//span//img[contains(@class,'sc-aca6d870-0 janHcI')]"
+    product_image = WebDriverWait(card, 3).until(EC.visibility_of_element_located((By.XPATH, image_xpath)))
+    image_url = product_image.get_attribute("src")
+
+    return {
+        "product_name": product_name,
+        "product_company": brand["product_company"],
+        "product_original_price": product_original_price,
+        "product_discounted_price": product_discounted_price,
+        "product_image": image_url,
+        "product_category": brand["product_category"],
+        "product_bottle_type": product_bottle_type,
+        "product_dietary_attribute": product_dietary_attribute
+    }
+
+def scroll_until_loaded(driver, drink_section, timeout):
+    # Keep scrolling while new cards keep appearing; stop once the count holds for `timeout` seconds
+    card_count = len(drink_section.find_elements(By.XPATH, CARD_XPATH))
     while True:
-        # Scroll down to bottom
         driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        try:
+            WebDriverWait(driver, timeout, poll_frequency=0.25).until(
+                lambda d: len(drink_section.find_elements(By.XPATH, CARD_XPATH)) > card_count
+            )
+        except TimeoutException:
+            return
+        card_count = len(drink_section.find_elements(By.XPATH, CARD_XPATH))
 
-        # Wait to load page
-        time.sleep(4)
-
-        # Calculate new scroll height and compare with last scroll height
-        new_height = driver.execute_script("return document.body.scrollHeight")
-        if new_height == last_height:
-            break
-        last_height = new_height
+def get_beverages_contents(driver, brand, url=None, scroll_timeout=6, save_fixture=None):
+    driver.get(url or brand["url"])
 
     try:
-        card_objects = drink_section.find_elements(By.XPATH,".//div[contains(@class,'sc-e68f503d-0 kxZjUB product-container')]")
-    except NoSuchElementException:
+        drink_section = WebDriverWait(driver, 15).until(
+            EC.presence_of_element_located((By.XPATH, "//div[contains(@class,'sc-84b21786-6 iTtMbI')]"))
+        )
+    except TimeoutException:
+        print(f"No Drink Objects for {brand['product_company']}")
+        return []
+
+    scroll_until_loaded(driver, drink_section, scroll_timeout)
+    if save_fixture:
+        with open(save_fixture, "w", encoding="utf-8") as f:
+            f.write(driver.page_source)
+
+    card_objects = drink_section.find_elements(By.XPATH, CARD_XPATH)
+    if not card_objects:
         print("No Card Objects")
 
+    products = []
     for card in card_objects:
-        
-        product_info_container = card.find_element(By.XPATH,".//div[contains(@class,'sc-e68f503d-32 jvFTSZ')]//div[contains(@class,'sc-e68f503d-8 kRpkxd')]")
-        product_price_container = product_info_container.find_elements(By.XPATH,".//div[contains(@class,'sc-e68f503d-11 iYFArc')]//div[contains(@class,'sc-e68f503d-10 dksglq')]")[0]
-        product_prices = product_price_container.find_elements(By.TAG_NAME, "span")
         try:
-            product_original_price = product_prices[0].get_attribute("innerText")
-        except NoSuchElementException:
-            print("No product_original_price")
-        try:
-            product_discounted_price = product_prices[2].get_attribute("innerText")
-        except NoSuchElementException:
-            print("No product_discounted_price")
-        except IndexError:
-            print("No product_discounted_price")
-            product_discounted_price = 0
-        product_name_container = product_info_container.find_elements(By.XPATH,".//div[contains(@class,'sc-e68f503d-7 cEAugL')]//div[contains(@class,'sc-408392be-0 capxft')]")[0]
-        product_names = product_name_container.find_elements(By.TAG_NAME, "span")
+            products.append(parse_card(card, brand))
+        except (NoSuchElementException, IndexError, TimeoutException) as e:
+            print("Skipping card:", e)
+    return products
 
-        product_name = product_names[1].get_attribute("innerText")
+def scrape_brand(brand, headless=True, fixtures_dir=None, save_fixtures_dir=None):
+    # Each worker owns its own browser for one brand page.
+    # With fixtures_dir set, the page is a saved <brand>.html file instead of the live site.
+    url = None
+    scroll_timeout = 6
+    if fixtures_dir:
+        url = "file://" + os.path.abspath(os.path.join(fixtures_dir, brand_slug(brand) + ".html"))
+        scroll_timeout = 0.5
+    save_fixture = os.path.join(save_fixtures_dir, brand_slug(brand) + ".html") if save_fixtures_dir else None
 
-        product_quantity_halal_or_not_container = product_info_container.find_elements(By.XPATH,".//div[contains(@class,'sc-e68f503d-7 cEAugL')]//div[contains(@class,'sc-e68f503d-31 jaFXRP')]//div[contains(@class,'sc-e94e62e6-1 daFmNg')]")[0]
-        product_quantity_halal_or_not = product_quantity_halal_or_not_container.find_elements(By.TAG_NAME, "span")
+    driver = driver_setup(headless)
+    try:
+        products = get_beverages_contents(driver, brand, url, scroll_timeout, save_fixture)
+    finally:
+        driver.quit()
+    print(f"{brand['product_company'].strip()}: {len(products)} products")
+    return products
 
-        product_bottle_type = product_quantity_halal_or_not[0].get_attribute("innerText")
+def scrape_brands(brands, workers=BROWSER_WORKERS, headless=True, fixtures_dir=None, save_fixtures_dir=None):
+    # Results come back in brand-list order, so new product ids are assigned deterministically
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(scrape_brand, brand, headless, fixtures_dir, save_fixtures_dir) for brand in brands]
+    products = []
+    seen = set()
+    for brand, future in zip(brands, futures):
         try:
-            product_dietary_attribute = product_quantity_halal_or_not[1].get_attribute("innerText")
-        except NoSuchElementException:
-            print("No product_dietary_attribute")
-        except IndexError:
-            product_dietary_attribute = ""
-        new_file_name = product_name + product_bottle_type + ".jpg"
-        print(WebDriverWait(card, 3).until(EC.visibility_of_element_located((By.XPATH,".//div[contains(@class,'sc-e68f503d-4 jdonid')]//span//img[contains(@class,'sc-aca6d870-0 janHcI')]"))).get_attribute("src"))
-        product_image = card.find_element(By.XPATH,".//div[contains(@class,'sc-e68f503d-4 jdonid')]//span//img[contains(@class,'sc-aca6d870-0 janHcI')]")
-        # image_elements = product_image_container.find_elements(By.TAG_NAME, "img")
-        image_url = product_image.get_attribute("src")
-        print(product_image.get_attribute("src"))
-        
-        image_path = download_image(image_url, image_folder,new_file_name)
-        product_id += 1
-        
-        product_list = []
-        product_list.append({
-            "product_id": product_id,
-            "product_name": product_name,
-            "product_company": product_company,
-            "product_original_price": product_original_price,
-            "product_discounted_price": product_discounted_price,
-            "product_image": image_url,
-            "product_image_path": image_path,
-            "product_category": product_category,
-            "product_bottle_type": product_bottle_type,
-            "product_dietary_attribute": product_dietary_attribute
-        })
-        df = pd.DataFrame(product_list)
-        csv_path = os.path.join(current_directory, "drinks_content.csv")
-        df.to_csv(csv_path, mode='a', header=False, index=False, encoding="utf-8-sig", sep=',')
+            brand_products = future.result()
+        except Exception as e:
+            print(f"Failed to scrape {brand['product_company'].strip()}: {e}")
+            continue
+        for product in brand_products:
+            key = product_key(product)
+            if key not in seen:
+                seen.add(key)
+                products.append(product)
+    return products
 
+def sync_products(products, state, session):
+    # Assign stable ids, download images for new/changed products on a worker pool, return rows to write
+    changed = []
+    for product in products:
+        key = product_key(product)
+        known = state["products"].get(key)
+        fingerprint = product_fingerprint(product)
+        if known is not None and known.get("fingerprint") == fingerprint:
+            continue
+        if known is None:
+            known = {"product_id": state["next_product_id"]}
+            state["next_product_id"] += 1
+            state["products"][key] = known
+        known["fingerprint"] = fingerprint
+        changed.append(dict(product, product_id=known["product_id"]))
 
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as pool:
+        futures = []
+        for product in changed:
+            file_name = product["product_name"] + product["product_bottle_type"] + ".jpg"
+            url = product["product_image"]
+            futures.append(pool.submit(download_image, session, url, image_folder, file_name, state["images"].get(url)))
+        for product, future in zip(changed, futures):
+            image_path, entry = future.result()
+            product["product_image_path"] = image_path
+            if entry is not None:
+                state["images"][product["product_image"]] = entry
+    return changed
+
+def write_products(rows):
+    # One rewrite per run: changed rows replace their old version, new rows are appended
+    if not rows:
+        return
+    existing = pd.read_csv(drinks_content_csv_path, encoding="utf-8-sig", dtype=str, keep_default_na=False)
+    updates = pd.DataFrame(rows, columns=CSV_COLUMNS).astype(str)
+    merged = pd.concat([existing[~existing['product_id'].isin(updates['product_id'])], updates])
+    merged = merged.sort_values('product_id', key=lambda ids: ids.astype(int))
+    merged.to_csv(drinks_content_csv_path + ".tmp", index=False, encoding="utf-8-sig", quoting=csv.QUOTE_MINIMAL)
+    os.replace(drinks_content_csv_path + ".tmp", drinks_content_csv_path)
 
 def main():
+    parser = argparse.ArgumentParser(description="Scrape FairPrice brand pages into drinks_content.csv")
+    parser.add_argument("--brands", nargs="*", help="brand names to scrape (default: all in BRANDS)")
+    parser.add_argument("--workers", type=int, default=BROWSER_WORKERS, help="browsers running in parallel")
+    parser.add_argument("--headed", action="store_true", help="show the browser windows")
+    parser.add_argument("--fixtures", help="scrape saved <brand>.html pages from this directory instead of the site")
+    parser.add_argument("--save-fixtures", help="save each loaded brand page as <brand>.html in this directory")
+    args = parser.parse_args()
+
+    brands = BRANDS
+    if args.brands:
+        wanted = {name.strip().lower() for name in args.brands}
+        brands = [brand for brand in BRANDS if brand["product_company"].strip().lower() in wanted]
+    if args.save_fixtures:
+        os.makedirs(args.save_fixtures, exist_ok=True)
+
     file_exists_check()
-    driver = driver_setup()
-    get_beverages_contents(driver)
-    driver.quit()
-    print("Scraping Completed Successfully!")
+    state = load_state()
+    session = session_setup()
+    products = scrape_brands(brands, args.workers, not args.headed, args.fixtures, args.save_fixtures)
+    changed = sync_products(products, state, session)
+    write_products(changed)
+    save_state(state)
+    print(f"Scraping Completed Successfully! {len(products)} products seen, {len(changed)} new or changed")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
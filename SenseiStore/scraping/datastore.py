@@ -0,0 +1,162 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+
+# Typed, memory-mappable copies of the scraped/synthetic CSVs.
+# Each table is a directory of .npy columns plus a manifest recording the source file it was built from;
+# the CSV is only parsed again when that source changes.
+FORMAT_VERSION = 1
+
+PRODUCT_COLUMNS = {
+    "product_id": "int",
+    "product_name": "category",
+    "product_company": "category",
+    "product_original_price": "price",
+    "product_discounted_price": "price",
+    "product_image": "category",
+    "product_image_path": "category",
+    "product_category": "category",
+    "product_bottle_type": "category",
+    "product_dietary_attribute": "category",
+}
+
+SALES_COLUMNS = {
+    "Order_ID": "prefixed_int",
+    "Customer_ID": "category",
+    "Customer_Type": "category",
+    "Product": "category",
+    "Category": "category",
+    "Unit_Price": "float",
+    "Quantity": "int",
+    "Discount": "float",
+    "Total_Price": "float",
+    "Order_Date": "date",
+    "Product_Image_Url": "category",
+    "Product_Bottle_Type": "category",
+    "Product_Dietary_Attribute": "category",
+    "Product_Company": "category",
+}
+
+
+def clean_price(column):
+    # "$1,234.50" -> 1234.5, blanks -> NaN
+    return pd.to_numeric(
+        column.astype(str).str.replace('$', '', regex=False).str.replace(',', '', regex=False).str.strip(),
+        errors='coerce'
+    )
+
+
+def store_dir_for(source_path, name):
+    return os.path.join(os.path.dirname(os.path.abspath(source_path)), ".store", name)
+
+
+def source_signature(source_path):
+    stat = os.stat(source_path)
+    return {"path": os.path.abspath(source_path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def encode_column(series, kind):
+    # Returns (arrays to save, metadata for the manifest)
+    if kind == "int":
+        values = pd.to_numeric(series, errors='raise')
+        dtype = np.int32 if values.abs().max() < 2 ** 31 else np.int64
+        return {"values": values.to_numpy(dtype=dtype)}, {}
+    if kind == "float":
+        return {"values": pd.to_numeric(series, errors='coerce').to_numpy(dtype=np.float64)}, {}
+    if kind == "price":
+        return {"values": clean_price(series).to_numpy(dtype=np.float64)}, {}
+    if kind == "date":
+        dates = pd.to_datetime(series, format='%d/%m/%Y')
+        return {"values": dates.to_numpy().astype('datetime64[D]')}, {}
+    if kind == "prefixed_int":
+        text = series.astype(str)
+        prefix = text.str.extract(r'^(\D*)', expand=False).iloc[0] if len(text) else ""
+        values = pd.to_numeric(text.str.slice(len(prefix)))
+        return {"values": values.to_numpy(dtype=np.int64)}, {"prefix": prefix}
+    if kind == "category":
+        categorical = pd.Categorical(series)
+        codes = categorical.codes
+        dtype = np.int16 if len(categorical.categories) < 2 ** 15 else np.int32
+        return {"codes": codes.astype(dtype)}, {"categories": [str(c) for c in categorical.categories]}
+    raise ValueError(f"Unknown column type '{kind}'")
+
+
+def decode_column(arrays, kind, meta):
+    if kind == "category":
+        return pd.Categorical.from_codes(arrays["codes"], categories=meta["categories"])
+    # prefixed_int stays numeric (ORD1000 -> 1000); the prefix is kept in df.attrs["prefixes"]
+    return arrays["values"]
+
+
+def build_table(source_path, columns, store_dir):
+    df = pd.read_csv(source_path, encoding="utf-8-sig")
+    os.makedirs(store_dir, exist_ok=True)
+    manifest_path = os.path.join(store_dir, "manifest.json")
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+    manifest = {"version": FORMAT_VERSION, "source": source_signature(source_path), "rows": len(df), "columns": {}}
+    for column, kind in columns.items():
+        arrays, meta = encode_column(df[column], kind)
+        for part, array in arrays.items():
+            np.save(os.path.join(store_dir, f"{column}.{part}.npy"), array)
+        manifest["columns"][column] = dict(meta, kind=kind, parts=list(arrays))
+
+    # The manifest goes last: a table without one is treated as stale
+    with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    return manifest
+
+
+def read_manifest(store_dir):
+    try:
+        with open(os.path.join(store_dir, "manifest.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_stale(manifest, source_path, columns):
+    if manifest is None or manifest.get("version") != FORMAT_VERSION:
+        return True
+    if manifest["source"] != source_signature(source_path):
+        return True
+    return {column: meta["kind"] for column, meta in manifest["columns"].items()} != columns
+
+
+def load_table(source_path, columns, store_dir=None, mmap=True):
+    store_dir = store_dir or store_dir_for(source_path, os.path.splitext(os.path.basename(source_path))[0])
+    manifest = read_manifest(store_dir)
+    if is_stale(manifest, source_path, columns):
+        print(f"📦 Building typed store for {source_path}...")
+        manifest = build_table(source_path, columns, store_dir)
+
+    data = {}
+    for column, meta in manifest["columns"].items():
+        arrays = {
+            part: np.load(os.path.join(store_dir, f"{column}.{part}.npy"), mmap_mode='r' if mmap else None)
+            for part in meta["parts"]
+        }
+        data[column] = decode_column(arrays, meta["kind"], meta)
+    df = pd.DataFrame(data, copy=False)
+    df.attrs["prefixes"] = {column: meta["prefix"] for column, meta in manifest["columns"].items() if "prefix" in meta}
+    return df
+
+
+def load_products(source_path, store_dir=None):
+    return load_table(source_path, PRODUCT_COLUMNS, store_dir)
+
+
+def load_sales(source_path, store_dir=None):
+    return load_table(source_path, SALES_COLUMNS, store_dir)
+
+
+if __name__ == "__main__":
+    # Rebuild both stores ahead of time, e.g. after re-scraping or regenerating sales data
+    here = os.path.dirname(os.path.abspath(__file__))
+    for source, columns in [("drinks_content_edited.csv", PRODUCT_COLUMNS), ("synthetic_sales_data.csv", SALES_COLUMNS)]:
+        path = os.path.join(here, source)
+        manifest = build_table(path, columns, store_dir_for(path, os.path.splitext(source)[0]))
+        print(f"✅ {source}: {manifest['rows']} rows stored")
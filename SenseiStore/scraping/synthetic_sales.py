@@ -1,109 +1,134 @@
-import pandas as pd
+import argparse
 import numpy as np
-import random
+import pandas as pd
 from datetime import datetime, timedelta
+from datastore import load_products as load_products_table
 
-# Load product data
-product_df = pd.read_csv("drinks_content_edited.csv", encoding="unicode_escape")
-
-# Clean price columns
-product_df['product_original_price'] = (
-    product_df['product_original_price']
-    .astype(str)
-    .str.replace('$', '', regex=False)
-    .str.replace(',', '', regex=False)
-    .str.strip()
-    .replace('', np.nan)
-    .astype(float)
-)
-
-product_df['product_discounted_price'] = (
-    product_df['product_discounted_price']
-    .astype(str)
-    .str.replace('$', '', regex=False)
-    .str.replace(',', '', regex=False)
-    .str.strip()
-    .replace('', '0')
-    .astype(float)
-)
-
-# Filter rows with valid essential fields
-product_df = product_df[
-    (product_df['product_original_price'].notnull()) &
-    (product_df['product_category'].notnull()) &
-    (product_df['product_name'].notnull())
+COLUMNS = [
+    "Order_ID", "Customer_ID", "Customer_Type", "Product", "Category", "Unit_Price", "Quantity",
+    "Discount", "Total_Price", "Order_Date", "Product_Image_Url", "Product_Bottle_Type",
+    "Product_Dietary_Attribute", "Product_Company"
 ]
+NUM_CUSTOMERS = 500
+CUSTOMER_TYPES = np.array(['B2B', 'B2C'], dtype=object)
+START_DATE = datetime(2023, 1, 1)
+NUM_DAYS = 365
+
+
+def load_products(path):
+    # Prices come back from the typed store already numeric
+    product_df = load_products_table(path).copy()
+    product_df['product_discounted_price'] = product_df['product_discounted_price'].fillna(0.0)
+
+    # Filter rows with valid essential fields
+    product_df = product_df[
+        (product_df['product_original_price'].notnull()) &
+        (product_df['product_category'].notnull()) &
+        (product_df['product_name'].notnull())
+    ]
+    return product_df.reset_index(drop=True)
+
+
+class OrderGenerator:
+    # Every column draws from its own seeded stream, so the output for a given seed
+    # is the same whatever chunk size it is written with.
+    def __init__(self, product_df, seed):
+        streams = np.random.SeedSequence(seed).spawn(5)
+        self.product_rng, self.quantity_rng, self.customer_rng, self.type_rng, self.date_rng = (
+            np.random.default_rng(stream) for stream in streams
+        )
+        self.names = product_df['product_name'].to_numpy(dtype=object)
+        self.categories = product_df['product_category'].to_numpy(dtype=object)
+        self.original_prices = product_df['product_original_price'].to_numpy(dtype=float)
+        self.discounted_prices = product_df['product_discounted_price'].to_numpy(dtype=float)
+        self.image_urls = product_df['product_image'].to_numpy(dtype=object)
+        self.bottle_types = product_df['product_bottle_type'].to_numpy(dtype=object)
+        self.dietary_attributes = product_df['product_dietary_attribute'].to_numpy(dtype=object)
+        self.companies = product_df['product_company'].to_numpy(dtype=object)
+        self.customer_ids = np.array([f"CUST{i}" for i in range(NUM_CUSTOMERS + 1)], dtype=object)
+        self.order_dates = np.array(
+            [(START_DATE + timedelta(days=day)).strftime('%d/%m/%Y') for day in range(NUM_DAYS)], dtype=object
+        )
+
+    def chunk(self, start, size):
+        product = self.product_rng.integers(0, len(self.names), size)
+        quantity = self.quantity_rng.integers(1, 101, size)
+        customer = self.customer_rng.integers(1, NUM_CUSTOMERS + 1, size)
+        customer_type = self.type_rng.integers(0, len(CUSTOMER_TYPES), size)
+        day = self.date_rng.integers(0, NUM_DAYS, size)
+
+        # Simple rule: if discounted_price exists, use it directly
+        unit_price = self.original_prices[product]
+        discounted_price = self.discounted_prices[product]
+        has_discount = discounted_price > 0
+        discount = np.where(has_discount, discounted_price, 0.0)
+        total_price = np.round(np.where(has_discount, discounted_price, unit_price) * quantity, 2)
+
+        return pd.DataFrame({
+            "Order_ID": "ORD" + pd.Series(np.arange(1000 + start, 1000 + start + size)).astype(str),
+            "Customer_ID": self.customer_ids[customer],
+            "Customer_Type": CUSTOMER_TYPES[customer_type],
+            "Product": self.names[product],
+            "Category": self.categories[product],
+            "Unit_Price": np.round(unit_price, 2),
+            "Quantity": quantity,
+            "Discount": discount,
+            "Total_Price": total_price,
+            "Order_Date": self.order_dates[day],
+            "Product_Image_Url": self.image_urls[product],
+            "Product_Bottle_Type": self.bottle_types[product],
+            "Product_Dietary_Attribute": self.dietary_attributes[product],
+            "Product_Company": self.companies[product],
+        }, columns=COLUMNS)
+
 
-# Generate synthetic orders
-num_orders = 3000
-order_ids = [f"ORD{1000 + i}" for i in range(num_orders)]
-customer_ids = [f"CUST{random.randint(1, 500)}" for _ in range(num_orders)]
-customer_types = [random.choice(['B2B', 'B2C']) for _ in range(num_orders)]
-order_dates = [datetime(2023, 1, 1) + timedelta(days=random.randint(0, 364)) for _ in range(num_orders)]
-
-orders = []
-
-for i in range(num_orders):
-    row = product_df.sample(1).iloc[0]
-    product = row['product_name']
-    category = row['product_category']
-    original_price = row['product_original_price']
-    discounted_price = row['product_discounted_price']
-    quantity = random.randint(1, 100)
-    product_image_url = row["product_image"]
-    product_bottle_type = row["product_bottle_type"]
-    product_dietary_attribute = row["product_dietary_attribute"]
-    product_company = row["product_company"]
-
-    total_price = 0
-    # Simple rule: if discounted_price exists, use it directly
-    if discounted_price > 0:
-        unit_price = original_price
-        discount = discounted_price  # No extra calculation needed
-        total_price = round(discount * quantity, 2)
+def write_csv(chunks, output):
+    for i, chunk in enumerate(chunks):
+        if i == 0:
+            chunk.to_csv(output, index=False, encoding="utf-8-sig")
+        else:
+            chunk.to_csv(output, mode='a', header=False, index=False, encoding="utf-8")
+
+
+def write_parquet(chunks, output):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(output, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def generate(product_path, output, rows, seed, chunk_size, file_format):
+    generator = OrderGenerator(load_products(product_path), seed)
+    chunks = (generator.chunk(start, min(chunk_size, rows - start)) for start in range(0, rows, chunk_size))
+    if file_format == "parquet":
+        write_parquet(chunks, output)
     else:
-        unit_price = original_price
-        discount = 0
-        total_price = round(unit_price * quantity, 2)
-
-    orders.append({
-        "Order_ID": order_ids[i],
-        "Customer_ID": customer_ids[i],
-        "Customer_Type": customer_types[i],
-        "Product": product,
-        "Category": category,
-        "Unit_Price": round(unit_price, 2),
-        "Quantity": quantity,
-        "Discount": discount,
-        "Total_Price": total_price,
-        "Order_Date": order_dates[i].strftime('%d/%m/%Y'),
-        "Product_Image_Url" : product_image_url,
-        "Product_Bottle_Type" : product_bottle_type,
-        "Product_Dietary_Attribute" : product_dietary_attribute,
-        "Product_Company" : product_company
-    })
-
-# Create DataFrame
-sales_df = pd.DataFrame(orders)
-
-# Set data types
-sales_df = sales_df.astype({
-    "Order_ID": "string",
-    "Customer_ID": "string",
-    "Customer_Type": "category",
-    "Product": "string",
-    "Category": "category",
-    "Unit_Price": "float",
-    "Quantity": "int",
-    "Discount": "float",
-    "Total_Price": "float",
-    "Order_Date": "string",
-    "Product_Image_Url" : "string",
-    "Product_Bottle_Type" : "string",
-    "Product_Dietary_Attribute" : "string",
-    "Product_Company" : "string"
-})
-
-# Save to CSV
-sales_df.to_csv("synthetic_sales_data.csv", index=False, encoding="utf-8-sig")
-print("✅ Synthetic sales data saved as 'synthetic_sales_data.csv'")
+        write_csv(chunks, output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic sales orders from the drinks catalogue")
+    parser.add_argument("--rows", type=int, default=3000, help="number of orders to generate")
+    parser.add_argument("--seed", type=int, default=42, help="random seed, same seed gives the same orders")
+    parser.add_argument("--chunk-size", type=int, default=250_000, help="orders generated and written per chunk")
+    parser.add_argument("--products", default="drinks_content_edited.csv", help="product catalogue CSV")
+    parser.add_argument("--output", default="synthetic_sales_data.csv", help="output file")
+    parser.add_argument("--format", choices=["csv", "parquet"], help="defaults to the output file extension")
+    args = parser.parse_args()
+
+    file_format = args.format or ("parquet" if args.output.endswith(".parquet") else "csv")
+    generate(args.products, args.output, args.rows, args.seed, args.chunk_size, file_format)
+    print(f"✅ {args.rows} synthetic orders saved as '{args.output}'")
+
+
+if __name__ == "__main__":
+    main()
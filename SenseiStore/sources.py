@@ -0,0 +1,206 @@
+import glob
+import os
+import time
+import cv2
+import numpy as np
+
+# Frame sources and distance sensors for MultiDetector. A source's open() returns a reader with the
+# cv2.VideoCapture read()/release() interface; a sensor has measure_distance() in cm.
+# Everything except CameraSource and UltrasonicSensor runs without a camera or GPIO.
+
+
+class CameraSource:
+    def __init__(self, index=0, width=640, height=480, fps=30, buffer_size=3):
+        self.index = index
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.buffer_size = buffer_size
+
+    def open(self):
+        cap = cv2.VideoCapture(self.index)
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        cap.set(cv2.CAP_PROP_FPS, self.fps)
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, self.buffer_size)
+        return cap
+
+
+class PacedReader:
+    # Base for the offline readers: optional looping, resizing and pacing to a target FPS (0 = full speed)
+    def __init__(self, fps=0, loop=True, size=None):
+        self.interval = 1 / fps if fps else 0
+        self.loop = loop
+        self.size = size
+        self.next_time = time.monotonic()
+        self.released = False
+
+    def read(self):
+        if self.released:
+            return False, None
+        if self.interval:
+            delay = self.next_time - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self.next_time = max(self.next_time + self.interval, time.monotonic())
+        frame = self.next_frame()
+        if frame is None and self.loop and self.rewind():
+            frame = self.next_frame()
+        if frame is None:
+            return False, None
+        if self.size is not None and (frame.shape[1], frame.shape[0]) != self.size:
+            frame = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        return True, frame
+
+    def grab(self):
+        # Standby reads: advance the source without returning the frame, like cv2.VideoCapture.grab()
+        return self.read()[0]
+
+    def release(self):
+        self.released = True
+
+    def next_frame(self):
+        raise NotImplementedError
+
+    def rewind(self):
+        return False
+
+
+class VideoFileReader(PacedReader):
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise FileNotFoundError(f"Cannot open video '{path}'")
+
+    def next_frame(self):
+        ret, frame = self.cap.read()
+        return frame if ret else None
+
+    def rewind(self):
+        return self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    def release(self):
+        super().release()
+        self.cap.release()
+
+
+class ImageDirReader(PacedReader):
+    # Images are decoded once up front so the benchmark measures the models, not JPEG decoding
+    def __init__(self, paths, **kwargs):
+        super().__init__(**kwargs)
+        self.frames = [frame for frame in (cv2.imread(path) for path in paths) if frame is not None]
+        if not self.frames:
+            raise FileNotFoundError("No readable images")
+        self.position = 0
+
+    def next_frame(self):
+        if self.position >= len(self.frames):
+            return None
+        frame = self.frames[self.position]
+        self.position += 1
+        return frame
+
+    def rewind(self):
+        self.position = 0
+        return True
+
+
+class SyntheticReader(PacedReader):
+    # A noisy background with a bright block sliding across it, so the motion gate sees movement
+    def __init__(self, width=640, height=480, seed=0, **kwargs):
+        super().__init__(**kwargs)
+        rng = np.random.default_rng(seed)
+        self.background = rng.integers(0, 64, (height, width, 3), dtype=np.uint8)
+        self.block = max(height // 4, 1)
+        self.position = 0
+
+    def next_frame(self):
+        frame = self.background.copy()
+        height, width = frame.shape[:2]
+        x = self.position % max(width - self.block, 1)
+        y = (height - self.block) // 2
+        frame[y:y + self.block, x:x + self.block] = 220
+        self.position += 8
+        return frame
+
+
+class VideoFileSource:
+    def __init__(self, path, fps=0, loop=True, size=None):
+        self.path = path
+        self.options = {"fps": fps, "loop": loop, "size": size}
+
+    def open(self):
+        return VideoFileReader(self.path, **self.options)
+
+
+class ImageDirSource:
+    def __init__(self, directory, fps=0, loop=True, size=None):
+        self.paths = sorted(
+            path for path in glob.glob(os.path.join(directory, "*"))
+            if os.path.splitext(path)[1].lower() in (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+        )
+        self.options = {"fps": fps, "loop": loop, "size": size}
+
+    def open(self):
+        return ImageDirReader(self.paths, **self.options)
+
+
+class SyntheticSource:
+    def __init__(self, width=640, height=480, fps=0, seed=0):
+        self.options = {"width": width, "height": height, "fps": fps, "seed": seed}
+
+    def open(self):
+        return SyntheticReader(**self.options)
+
+
+def parse_source(spec, fps=0, size=None):
+    # "camera[:index]", "video:<path>", "images:<dir>" or "synthetic[:WxH]"
+    kind, _, arg = spec.partition(":")
+    if kind == "camera":
+        return CameraSource(int(arg or 0))
+    if kind == "video":
+        return VideoFileSource(arg, fps=fps, size=size)
+    if kind == "images":
+        return ImageDirSource(arg, fps=fps, size=size)
+    if kind == "synthetic":
+        width, height = (int(v) for v in arg.split("x")) if arg else (size or (640, 480))
+        return SyntheticSource(width, height, fps=fps)
+    raise ValueError(f"Unknown frame source '{spec}'")
+
+
+class UltrasonicSensor:
+    def __init__(self, trig_pin, echo_pin):
+        # Imported here so the rest of the pipeline can run on machines without GPIO
+        from gpiozero import DistanceSensor
+        self.sensor = DistanceSensor(echo=echo_pin, trigger=trig_pin, max_distance=2)
+        self.threshold_distance = 80
+
+    def measure_distance(self):
+        dist_cm = self.sensor.distance * 100
+        return round(dist_cm, 2)
+
+
+class ScriptedSensor:
+    # Replays a distance trace: [(seconds from start, distance cm), ...], holding each value until the next
+    def __init__(self, trace, loop=False):
+        self.trace = sorted(trace)
+        self.loop = loop
+        self.started = time.monotonic()
+
+    @classmethod
+    def parse(cls, text, loop=False):
+        # "0:150,5:40,60:150" -> away, someone walks up after 5 s, leaves after 60 s
+        return cls([tuple(float(v) for v in step.split(":")) for step in text.split(",")], loop)
+
+    def measure_distance(self):
+        elapsed = time.monotonic() - self.started
+        if self.loop and len(self.trace) > 1:
+            elapsed %= self.trace[-1][0] or 1
+        distance = self.trace[0][1]
+        for at, value in self.trace:
+            if elapsed < at:
+                break
+            distance = value
+        return distance
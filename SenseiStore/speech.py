@@ -0,0 +1,294 @@
+import hashlib
+import heapq
+import itertools
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import playsound
+
+EMOTION_PHRASES = {
+    "happy": "You seem happy! We recommend trying our {item} ",
+    "sad": "You seem a little down — maybe a refreshing {item} can lift your mood.",
+    "angry": "Feeling frustrated? A cold {item} might help cool things down.",
+    "surprise": "Looks like that caught your attention! {item} is full of surprises",
+    "disgust": "Not your vibe? No worries — we’ve got 9 other drinks that might be a better match than {item}.",
+    "fear": "Not sure about that one? {item} is a safe choice",
+    "neutral": "Hard to tell what you think — maybe {item} will change your mind?"
+}
+DEFAULT_PHRASE = "Try one of our top drinks today!"
+BRAND_PHRASE = "You seem to be interested in {brand}. How about these few?"
+
+
+def recommendation_phrase(emotion, item):
+    template = EMOTION_PHRASES.get(emotion)
+    if template is None:
+        return DEFAULT_PHRASE
+    return template.format(item=item)
+
+
+def brand_phrase(brand):
+    return BRAND_PHRASE.format(brand=brand)
+
+
+def all_phrases(products, brands):
+    phrases = [DEFAULT_PHRASE]
+    for emotion in EMOTION_PHRASES:
+        phrases.extend(recommendation_phrase(emotion, product) for product in products)
+    phrases.extend(brand_phrase(brand) for brand in brands)
+    return phrases
+
+
+class GTTSBackend:
+    name = "gtts"
+    extension = "mp3"
+
+    def __init__(self, lang='en'):
+        self.lang = lang
+
+    def synthesize(self, text, path):
+        from gtts import gTTS
+        gTTS(text=text, lang=self.lang).save(path)
+
+
+class EspeakBackend:
+    # Offline, needs the espeak-ng (or espeak) binary on PATH
+    name = "espeak"
+    extension = "wav"
+
+    def __init__(self, lang='en'):
+        self.lang = lang
+        self.binary = shutil.which("espeak-ng") or shutil.which("espeak")
+
+    def synthesize(self, text, path):
+        if self.binary is None:
+            raise RuntimeError("espeak-ng is not installed")
+        subprocess.run([self.binary, "-v", self.lang, "-w", path, text], check=True, capture_output=True)
+
+
+class Pyttsx3Backend:
+    # Offline, uses the platform speech engine (SAPI5 / NSSpeechSynthesizer / espeak)
+    name = "pyttsx3"
+    extension = "wav"
+
+    def __init__(self, lang='en'):
+        import pyttsx3
+        self.engine = pyttsx3.init()
+        self.lock = threading.Lock()
+
+    def synthesize(self, text, path):
+        with self.lock:
+            self.engine.save_to_file(text, path)
+            self.engine.runAndWait()
+
+
+BACKENDS = {
+    "gtts": GTTSBackend,
+    "espeak": EspeakBackend,
+    "pyttsx3": Pyttsx3Backend,
+}
+
+
+def create_backend(name, lang='en'):
+    if not name:
+        return None
+    try:
+        return BACKENDS[name](lang=lang)
+    except Exception as e:
+        print(f"🔊 TTS backend '{name}' unavailable:", e)
+        return None
+
+
+class PhraseCache:
+    # Content-addressed audio files (one per backend + text), evicted least recently used first.
+    # Backends are tried in order, so an offline fallback only renders what the primary could not.
+    def __init__(self, cache_dir, backends, max_entries=2000):
+        self.cache_dir = cache_dir
+        self.backends = [backend for backend in backends if backend is not None]
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        os.makedirs(cache_dir, exist_ok=True)
+
+        existing = []
+        for name in os.listdir(cache_dir):
+            path = os.path.join(cache_dir, name)
+            if not name.startswith('.') and os.path.isfile(path):
+                existing.append((os.path.getmtime(path), path))
+        for _, path in sorted(existing):
+            self.entries[path] = None
+
+    def path_for(self, backend, text):
+        digest = hashlib.sha1(f"{backend.name}:{getattr(backend, 'lang', '')}:{text}".encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.{backend.extension}")
+
+    def lookup(self, text):
+        for backend in self.backends:
+            path = self.path_for(backend, text)
+            with self.lock:
+                if path in self.entries and os.path.exists(path):
+                    self.entries.move_to_end(path)
+                    os.utime(path)
+                    return path
+        return None
+
+    def get(self, text):
+        path = self.lookup(text)
+        if path is not None:
+            return path
+        for backend in self.backends:
+            try:
+                return self.render(backend, text)
+            except Exception as e:
+                print(f"🔊 TTS Error ({backend.name}):", e)
+        return None
+
+    def render(self, backend, text):
+        path = self.path_for(backend, text)
+        # Render to a unique temp file so concurrent renders never clobber each other
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix='.', suffix=f".{backend.extension}")
+        os.close(fd)
+        try:
+            backend.synthesize(text, tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        with self.lock:
+            self.entries[path] = None
+            self.entries.move_to_end(path)
+            while len(self.entries) > self.max_entries:
+                evicted, _ = self.entries.popitem(last=False)
+                if os.path.exists(evicted):
+                    os.remove(evicted)
+        return path
+
+    def warm_up(self, phrases):
+        rendered = 0
+        for text in dict.fromkeys(phrases):
+            if self.lookup(text) is None and self.get(text) is not None:
+                rendered += 1
+        print(f"🔊 TTS cache warm-up done: {rendered} new phrases, {len(self.entries)} cached")
+
+    def start_warm_up(self, phrases):
+        threading.Thread(target=self.warm_up, args=(list(phrases),), daemon=True).start()
+
+
+# Lower number wins: a shopper holding a product outranks a mood read
+PRIORITY_BRAND = 0
+PRIORITY_EMOTION = 1
+
+
+class SpeechScheduler:
+    # One worker owns the audio device. Prompts wait in a small priority queue, a newer prompt
+    # of the same kind replaces the pending one, and prompts older than max_age are dropped.
+    def __init__(self, cache, cooldown_period=7, max_queue=4, max_age=5, player=playsound.playsound):
+        self.cache = cache
+        self.cooldown_period = cooldown_period
+        self.max_queue = max_queue
+        self.max_age = max_age
+        self.player = player
+        self.condition = threading.Condition()
+        self.pending = []
+        self.sequence = itertools.count()
+        self.last_accepted_time = float('-inf')
+        self.last_accepted_priority = None
+        self.counters = {"submitted": 0, "spoken": 0, "coalesced": 0, "failed": 0,
+                         "dropped_cooldown": 0, "dropped_full": 0, "dropped_stale": 0}
+        self.timings = {"synthesis_ms": [0, 0.0], "playback_ms": [0, 0.0]}
+        self.stopped = False
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        # Pending prompts are dropped; one already playing finishes first
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def submit(self, text, kind, priority):
+        now = time.monotonic()
+        with self.condition:
+            self.counters["submitted"] += 1
+            in_cooldown = now - self.last_accepted_time <= self.cooldown_period
+            if in_cooldown and priority >= self.last_accepted_priority:
+                self.counters["dropped_cooldown"] += 1
+                return False
+
+            for entry in self.pending:
+                if entry[2]["kind"] == kind:
+                    entry[2].update(text=text, created=now)
+                    self.counters["coalesced"] += 1
+                    self._accept(now, priority)
+                    return True
+
+            if len(self.pending) >= self.max_queue:
+                worst = max(self.pending)
+                if worst[0] <= priority:
+                    self.counters["dropped_full"] += 1
+                    return False
+                self.pending.remove(worst)
+                heapq.heapify(self.pending)
+                self.counters["dropped_full"] += 1
+
+            heapq.heappush(self.pending, (priority, next(self.sequence), {"text": text, "kind": kind, "created": now}))
+            self._accept(now, priority)
+            self.condition.notify()
+        return True
+
+    def _accept(self, now, priority):
+        self.last_accepted_time = now
+        self.last_accepted_priority = priority
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.stopped:
+                    self.condition.wait()
+                if self.stopped:
+                    return
+                _, _, utterance = heapq.heappop(self.pending)
+            if time.monotonic() - utterance["created"] > self.max_age:
+                self._count("dropped_stale")
+                continue
+            try:
+                start = time.monotonic()
+                path = self.cache.get(utterance["text"])
+                synthesized = time.monotonic()
+                self._record("synthesis_ms", (synthesized - start) * 1000)
+                if path is None:
+                    self._count("failed")
+                    continue
+                self.player(path)
+                self._record("playback_ms", (time.monotonic() - synthesized) * 1000)
+                self._count("spoken")
+            except Exception as e:
+                self._count("failed")
+                print("🔊 TTS Error:", e)
+
+    def _count(self, name):
+        with self.condition:
+            self.counters[name] += 1
+
+    def _record(self, name, duration_ms):
+        with self.condition:
+            timing = self.timings[name]
+            timing[0] += 1
+            timing[1] += duration_ms
+
+    def metrics(self):
+        with self.condition:
+            result = dict(self.counters, queue_depth=len(self.pending))
+            for name, (count, total) in self.timings.items():
+                result[f"avg_{name}"] = round(total / count, 2) if count else None
+        return result
@@ -0,0 +1,130 @@
+import os
+import time
+from collections import deque
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def cpu_percent():
+    # System-wide CPU use; falls back to the 1-minute load average when psutil is not installed
+    if psutil is not None:
+        return psutil.cpu_percent(interval=None)
+    return min(os.getloadavg()[0] / (os.cpu_count() or 1) * 100, 100.0)
+
+
+def build_ladder(max_width, min_width, max_quality, min_quality, max_fps, min_fps, steps):
+    # Operating points from the ceiling (level 0) down to the floor, every setting lowered a little per step
+    ladder = []
+    for i in range(steps):
+        t = i / max(steps - 1, 1)
+        ladder.append({
+            "width": int(round((max_width - t * (max_width - min_width)) / 16) * 16),
+            "quality": int(round(max_quality - t * (max_quality - min_quality))),
+            "fps": round(max_fps - t * (max_fps - min_fps), 1),
+        })
+    return ladder
+
+
+class StreamQualityController:
+    # Picks the live stream's resolution, JPEG quality and frame rate from what the link and CPU keep up with.
+    # Steps down as soon as the publish backlog, encode time or CPU exceed their budget; steps back up only
+    # after raise_after calm intervals in a row, so it does not oscillate.
+    def __init__(self, max_width=640, min_width=320, max_quality=80, min_quality=40, max_fps=30, min_fps=5,
+                 steps=6, interval=1.0, max_backlog=2, drop_backlog=4, cpu_high=85.0, cpu_low=60.0, raise_after=3):
+        self.ladder = build_ladder(max_width, min_width, max_quality, min_quality, max_fps, min_fps, steps)
+        self.level = 0
+        self.interval = interval
+        self.max_backlog = max_backlog
+        self.drop_backlog = drop_backlog
+        self.cpu_high = cpu_high
+        self.cpu_low = cpu_low
+        self.raise_after = raise_after
+        self.calm_intervals = 0
+        self.pending = deque(maxlen=64)
+        self.next_send = 0.0
+        self.last_adjusted = time.monotonic()
+        self.encode_ms = 0.0
+        self.encode_samples = 0
+        self.last_encode_ms = 0.0
+        self.last_cpu = 0.0
+        self.last_backlog = 0
+        self.dropped = 0
+        if psutil is not None:
+            psutil.cpu_percent(interval=None)
+
+    @property
+    def point(self):
+        return self.ladder[self.level]
+
+    def backlog(self):
+        # Stream messages handed to the MQTT client but not yet written to the socket
+        while self.pending and self.pending[0].is_published():
+            self.pending.popleft()
+        return sum(1 for info in self.pending if not info.is_published())
+
+    def should_send(self, now):
+        # Frame rate cap, and a hard drop while the link is far behind so the viewer never lags by seconds.
+        # Sends follow a running schedule and a frame up to half an interval early still goes out, so
+        # a camera running at the cap with some jitter is not throttled below it; a late send does not
+        # earn a burst of catch-up frames.
+        interval = 1 / self.point["fps"]
+        if now < self.next_send - interval / 2:
+            return False
+        if self.backlog() >= self.drop_backlog:
+            self.dropped += 1
+            return False
+        self.next_send = max(self.next_send + interval, now)
+        return True
+
+    def frame_size(self, width, height):
+        target = min(self.point["width"], width)
+        return target, int(round(height * target / width / 2) * 2)
+
+    def record(self, encode_ms, info=None, now=None):
+        # info is the MQTTMessageInfo returned by publish(), if any
+        if info is not None and hasattr(info, "is_published"):
+            self.pending.append(info)
+        self.encode_ms += encode_ms
+        self.encode_samples += 1
+        now = time.monotonic() if now is None else now
+        if now - self.last_adjusted >= self.interval:
+            self.adjust(now)
+
+    def adjust(self, now):
+        encode_ms = self.encode_ms / self.encode_samples if self.encode_samples else 0.0
+        # Encoding may use at most half of the frame interval
+        encode_budget = 500 / self.point["fps"]
+        backlog = self.backlog()
+        cpu = cpu_percent()
+
+        if backlog > self.max_backlog or encode_ms > encode_budget or cpu > self.cpu_high:
+            self.level = min(self.level + 1, len(self.ladder) - 1)
+            self.calm_intervals = 0
+        elif backlog == 0 and encode_ms < encode_budget / 2 and cpu < self.cpu_low:
+            self.calm_intervals += 1
+            if self.calm_intervals >= self.raise_after:
+                self.level = max(self.level - 1, 0)
+                self.calm_intervals = 0
+        else:
+            self.calm_intervals = 0
+
+        self.last_encode_ms = encode_ms
+        self.last_cpu = cpu
+        self.last_backlog = backlog
+        self.encode_ms = 0.0
+        self.encode_samples = 0
+        self.last_adjusted = now
+
+    def operating_point(self):
+        return dict(
+            self.point,
+            level=self.level,
+            levels=len(self.ladder),
+            backlog=self.last_backlog,
+            encode_ms=round(self.last_encode_ms, 1),
+            cpu_percent=round(self.last_cpu, 1),
+            dropped=self.dropped,
+        )
@@ -0,0 +1,46 @@
+import numpy as np
+
+from tracking import HOLDING, PICKUP_STARTED, RELEASED, DrinkVoter
+
+FRAME = np.zeros((48, 64, 3), dtype=np.uint8)
+CAN = {7: (0.9, (10, 10, 30, 40))}
+
+
+def feed(voter, detections, start, frames, fps=10):
+    events = []
+    for i in range(frames):
+        events += [event for event, _ in voter.update(detections, FRAME, start + i / fps)]
+    return events
+
+
+def test_leave_and_return_starts_a_new_pickup():
+    voter = DrinkVoter(votes_needed=3, window=5, heartbeat_interval=2.0, release_after=2.0)
+    assert feed(voter, CAN, 0.0, 30) == [PICKUP_STARTED, HOLDING]
+
+    # The customer walks away holding the can: no more frames reach the drink stage
+    assert voter.expire(3.0) == []
+    assert [event for event, _ in voter.expire(5.0)] == [RELEASED]
+    assert voter.tracks == {}
+
+    # The next customer picks up the same drink and gets a pickup of their own
+    assert feed(voter, CAN, 60.0, 3) == [PICKUP_STARTED]
+    assert voter.snapshot()[PICKUP_STARTED] == 2
+    assert voter.snapshot()[RELEASED] == 1
+
+
+def test_flush_releases_held_drinks_only():
+    voter = DrinkVoter(votes_needed=3, window=5)
+    feed(voter, CAN, 0.0, 3)
+    feed(voter, {8: (0.85, (0, 0, 5, 5))}, 0.3, 1)
+    events = voter.flush()
+    assert [(event, track.cls_id) for event, track in events] == [(RELEASED, 7)]
+    assert voter.tracks == {}
+    assert voter.snapshot()["held"] == 0
+
+
+def test_flickering_drink_is_not_picked_up():
+    voter = DrinkVoter(votes_needed=3, window=5)
+    events = []
+    for i in range(20):
+        events += voter.update(CAN if i % 3 == 0 else {}, FRAME, i / 10)
+    assert events == []
@@ -0,0 +1,84 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Log-spaced bucket bounds from 10 µs to ~50 s, each 25% wider than the last
+BUCKET_BOUNDS_MS = [0.01 * 1.25 ** i for i in range(70)]
+PERCENTILES = (50, 90, 99)
+
+
+def wall_time(monotonic_ts):
+    # Converts a time.monotonic() stamp to epoch seconds, so it can be compared across devices
+    return time.time() - (time.monotonic() - monotonic_ts)
+
+
+class Histogram:
+    # Fixed buckets: constant memory however many samples are recorded, percentiles are bucket upper bounds
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms):
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, p):
+        if not self.count:
+            return None
+        rank = self.count * p / 100
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return round(min(BUCKET_BOUNDS_MS[i], self.max_ms) if i < len(BUCKET_BOUNDS_MS) else self.max_ms, 2)
+        return round(self.max_ms, 2)
+
+    def snapshot(self):
+        result = {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 2) if self.count else None,
+            "max_ms": round(self.max_ms, 2),
+        }
+        for p in PERCENTILES:
+            result[f"p{p}_ms"] = self.percentile(p)
+        return result
+
+
+class Tracer:
+    # Named latency histograms shared by the threads of one process
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+
+    def observe(self, name, ms):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(ms)
+
+    def observe_since(self, name, started):
+        # started is a time.perf_counter() stamp; returns the elapsed ms
+        ms = (time.perf_counter() - started) * 1000
+        self.observe(name, ms)
+        return ms
+
+    @contextmanager
+    def span(self, name, durations=None):
+        # Times the block into the named histogram, and into durations[name] when a per-frame dict is given
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            ms = self.observe_since(name, started)
+            if durations is not None:
+                durations[name] = round(durations.get(name, 0) + ms, 2)
+
+    def snapshot(self):
+        with self.lock:
+            return {name: histogram.snapshot() for name, histogram in sorted(self.histograms.items())}
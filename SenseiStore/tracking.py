@@ -0,0 +1,215 @@
+import itertools
+import threading
+from collections import deque
+import cv2
+import numpy as np
+
+# Events of a drink pickup, sent as the "event" field of camera/<kiosk_id>/softdrink
+PICKUP_STARTED = "pickup_started"
+HOLDING = "holding"
+RELEASED = "released"
+
+
+def box_iou(a, b):
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(ix2 - ix1, 0) * max(iy2 - iy1, 0)
+    if inter == 0:
+        return 0.0
+    area_a = (a[2] - a[0]) * (a[3] - a[1])
+    area_b = (b[2] - b[0]) * (b[3] - b[1])
+    return inter / float(area_a + area_b - inter)
+
+
+def face_thumbnail(crop, size=32):
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    return cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA).astype(np.int16)
+
+
+class FaceTrack:
+    __slots__ = ("track_id", "box", "last_seen", "last_evaluated", "thumbnail", "scores", "emotion")
+
+    def __init__(self, track_id, box, now):
+        self.track_id = track_id
+        self.box = box
+        self.last_seen = now
+        self.last_evaluated = None
+        self.thumbnail = None
+        self.scores = None
+        self.emotion = None
+
+
+class FaceTracker:
+    # Matches face boxes frame to frame (IoU first, centroid distance as a fallback) so DeepFace
+    # only runs when a face is new, its emotion is due for a refresh, or the crop changed a lot.
+    def __init__(self, iou_threshold=0.3, max_missing=1.0, eval_interval=2.0, change_threshold=18.0, smoothing=0.5):
+        self.iou_threshold = iou_threshold
+        self.max_missing = max_missing
+        self.eval_interval = eval_interval
+        self.change_threshold = change_threshold
+        self.smoothing = smoothing
+        self.tracks = {}
+        self.next_id = itertools.count(1)
+
+    def update(self, boxes, now):
+        for track_id in [tid for tid, t in self.tracks.items() if now - t.last_seen > self.max_missing]:
+            del self.tracks[track_id]
+
+        pairs = []
+        for i, box in enumerate(boxes):
+            for track in self.tracks.values():
+                score = box_iou(box, track.box)
+                if score < self.iou_threshold:
+                    score = self._centroid_score(box, track.box)
+                if score > 0:
+                    pairs.append((score, i, track.track_id))
+        pairs.sort(reverse=True)
+
+        matched = {}
+        used_tracks = set()
+        for score, i, track_id in pairs:
+            if i in matched or track_id in used_tracks:
+                continue
+            matched[i] = self.tracks[track_id]
+            used_tracks.add(track_id)
+
+        result = []
+        for i, box in enumerate(boxes):
+            track = matched.get(i)
+            if track is None:
+                track = FaceTrack(next(self.next_id), box, now)
+                self.tracks[track.track_id] = track
+            track.box = box
+            track.last_seen = now
+            result.append(track)
+        return result
+
+    def _centroid_score(self, a, b):
+        # Close centres still count as the same face, scored below any IoU match
+        ca = ((a[0] + a[2]) / 2, (a[1] + a[3]) / 2)
+        cb = ((b[0] + b[2]) / 2, (b[1] + b[3]) / 2)
+        distance = ((ca[0] - cb[0]) ** 2 + (ca[1] - cb[1]) ** 2) ** 0.5
+        limit = 0.5 * max(b[2] - b[0], b[3] - b[1], 1)
+        if distance > limit:
+            return 0.0
+        return self.iou_threshold * (1 - distance / limit) * 0.99
+
+    def needs_evaluation(self, track, thumbnail, now):
+        if track.last_evaluated is None:
+            return True
+        if now - track.last_evaluated >= self.eval_interval:
+            return True
+        return float(np.mean(np.abs(thumbnail - track.thumbnail))) > self.change_threshold
+
+    def apply_emotion(self, track, scores, thumbnail, now):
+        if track.scores is None:
+            track.scores = dict(scores)
+        else:
+            for emotion, value in scores.items():
+                previous = track.scores.get(emotion, value)
+                track.scores[emotion] = self.smoothing * value + (1 - self.smoothing) * previous
+        track.emotion = max(track.scores, key=track.scores.get)
+        track.thumbnail = thumbnail
+        track.last_evaluated = now
+
+
+class DrinkTrack:
+    __slots__ = ("cls_id", "votes", "holding", "started", "last_heartbeat", "last_seen", "confidence", "best")
+
+    def __init__(self, cls_id, window):
+        self.cls_id = cls_id
+        self.votes = deque(maxlen=window)
+        self.holding = False
+        self.started = None
+        self.last_heartbeat = None
+        self.last_seen = None
+        self.confidence = 0.0
+        # (frame, box) of the most confident sighting before the pickup was confirmed
+        self.best = None
+
+
+class DrinkVoter:
+    # Per-class N-of-M voting over consecutive drink frames. A class counts as picked up once it is seen
+    # in votes_needed of the last window frames and as put down once it is missing from the whole window,
+    # so a flickering detection neither starts nor ends a pickup. Only these changes, plus an optional
+    # heartbeat every heartbeat_interval while the drink is held, become events.
+    # Frames stop arriving when the customer leaves, so a drink not seen for release_after seconds is put
+    # down by time as well; expire() does that without a frame, flush() ends every pickup at once.
+    def __init__(self, votes_needed=3, window=5, heartbeat_interval=2.0, release_after=2.0):
+        self.votes_needed = votes_needed
+        self.window = window
+        self.heartbeat_interval = heartbeat_interval
+        self.release_after = release_after
+        self.tracks = {}
+        self.counters = {"frames": 0, "detections": 0, PICKUP_STARTED: 0, HOLDING: 0, RELEASED: 0}
+        # The drink stage updates while the stats thread takes snapshots
+        self.lock = threading.Lock()
+
+    def update(self, detections, frame, now):
+        # detections: {cls_id: (conf, box)} for one frame. Returns [(event, track), ...]
+        with self.lock:
+            return self._update(detections, frame, now)
+
+    def _update(self, detections, frame, now):
+        self.counters["frames"] += 1
+        self.counters["detections"] += len(detections)
+        for cls_id in detections.keys() - self.tracks.keys():
+            self.tracks[cls_id] = DrinkTrack(cls_id, self.window)
+
+        events = []
+        for cls_id, track in list(self.tracks.items()):
+            hit = detections.get(cls_id)
+            track.votes.append(hit is not None)
+            if hit is not None:
+                track.last_seen = now
+                if not track.holding and hit[0] > track.confidence:
+                    track.best = (frame, hit[1])
+                track.confidence = max(track.confidence, hit[0])
+            votes = sum(track.votes)
+
+            if not track.holding:
+                if votes >= self.votes_needed:
+                    track.holding = True
+                    track.started = track.last_heartbeat = now
+                    events.append((PICKUP_STARTED, track))
+                elif votes == 0:
+                    del self.tracks[cls_id]
+            elif votes == 0:
+                events.append((RELEASED, track))
+                del self.tracks[cls_id]
+            elif self.heartbeat_interval and now - track.last_heartbeat >= self.heartbeat_interval:
+                track.last_heartbeat = now
+                events.append((HOLDING, track))
+
+        events += self._expire(now)
+        for event, _ in events:
+            self.counters[event] += 1
+        return events
+
+    def expire(self, now):
+        # Puts down drinks not seen for release_after seconds; returns their RELEASED events
+        with self.lock:
+            events = self._expire(now)
+            self.counters[RELEASED] += len(events)
+        return events
+
+    def _expire(self, now):
+        events = []
+        for cls_id, track in list(self.tracks.items()):
+            if now - track.last_seen >= self.release_after:
+                if track.holding:
+                    events.append((RELEASED, track))
+                del self.tracks[cls_id]
+        return events
+
+    def flush(self):
+        # Ends every pickup, e.g. when the customer has left: RELEASED for each held drink, then a clean slate
+        with self.lock:
+            events = [(RELEASED, track) for track in self.tracks.values() if track.holding]
+            self.tracks = {}
+            self.counters[RELEASED] += len(events)
+        return events
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.counters, held=sum(1 for track in self.tracks.values() if track.holding))